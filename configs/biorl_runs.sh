@@ -1,5 +1,5 @@
 # DEBUGGING, single stream
-python -m ipdb -c continue configs/biorl_trainer.py \
+python -m ipdb -c continue configs/trainer.py \
   --search='qlearning' \
   --parallel='none' \
   --run_distributed=False \
@@ -9,7 +9,7 @@ python -m ipdb -c continue configs/biorl_trainer.py \
   --wandb_project=neurorl_debug
 
 # DEBUGGING, no_jit, single stream
-JAX_DISABLE_JIT=1 python -m ipdb -c continue configs/biorl_trainer.py \
+JAX_DISABLE_JIT=1 python -m ipdb -c continue configs/trainer.py \
   --search='qlearning' \
   --parallel='none' \
   --run_distributed=False \
@@ -20,7 +20,7 @@ JAX_DISABLE_JIT=1 python -m ipdb -c continue configs/biorl_trainer.py \
 
 
 # running a search, single-stream
-python configs/biorl_trainer.py \
+python configs/trainer.py \
   --search='qlearning' \
   --parallel='sbatch' \
   --run_distributed=False \
@@ -47,6 +47,7 @@ python configs/humansf_trainer.py \
 Change "search" to what you want to search over.
 
 """
+import copy
 import functools 
 
 from typing import Callable, Optional
@@ -57,9 +58,6 @@ from absl import flags
 from absl import app
 from absl import logging
 import os
-from ray import tune
-from launchpad.nodes.python.local_multi_processing import PythonProcess
-import launchpad as lp
 
 from acme import wrappers as acme_wrappers
 from acme.jax import experiments
@@ -67,7 +65,9 @@ import dm_env
 
 import minigrid
 
-from lib.dm_env_wrappers import GymWrapper
+from td_agents import basics
+
+from lib.dm_env_wrappers import GymWrapper, compile_wrapper
 import lib.env_wrappers as env_wrappers
 import lib.experiment_builder as experiment_builder
 import lib.experiment_logger as experiment_logger
@@ -85,7 +85,7 @@ from envs.key_room_objects_test import (
 flags.DEFINE_string('config_file', '', 'config file')
 flags.DEFINE_string('search', 'default', 'which search to use.')
 flags.DEFINE_string(
-    'parallel', 'none', "none: run 1 experiment. sbatch: run many experiments with SBATCH. ray: run many experiments with say. use sbatch with SLUM or ray otherwise.")
+    'parallel', 'none', "none: run 1 experiment. sbatch: run many experiments with SBATCH. ray: run many experiments with say. use sbatch with SLUM or ray otherwise. serial: run many experiments one after another in this process.")
 flags.DEFINE_bool(
     'debug', False, 'If in debugging mode, only 1st config is run.')
 flags.DEFINE_bool(
@@ -206,11 +206,11 @@ def make_keyroom_object_test_env(seed: int,
   ####################################
   # add acme wrappers
   wrapper_list = [
-    acme_wrappers.ObservationActionRewardWrapper,
-    acme_wrappers.SinglePrecisionWrapper,
+    compile_wrapper(env.observation_spec()),
   ]
 
-  return acme_wrappers.wrap_all(env, wrapper_list)
+  env = acme_wrappers.wrap_all(env, wrapper_list)
+  return env
 
 def setup_experiment_inputs(
     make_environment_fn: Callable,
@@ -361,6 +361,12 @@ def train_single(
     env_kwargs=env_kwargs,
     debug=debug)
 
+  # -----------------------
+  # share compiled programs across runs (and trials of a search)
+  # -----------------------
+  utils.initialize_config_compilation_cache(
+    experiment_config_inputs.agent_config, FLAGS.jax_cache_dir)
+
   logger_factory_kwargs = dict(
     actor_label="actor",
     evaluator_label="evaluator",
@@ -375,6 +381,8 @@ def train_single(
     debug=debug
   )
   if run_distributed:
+    from launchpad.nodes.python.local_multi_processing import PythonProcess
+    import launchpad as lp
     program = experiments.make_distributed_experiment(
         experiment=experiment,
         num_actors=num_actors)
@@ -443,8 +451,8 @@ def run_single():
   # override with config settings, e.g. from parallel run
   ########################
   if FLAGS.config_file:
-    configs = utils.load_config(FLAGS.config_file)
-    config = configs[FLAGS.config_idx-1]  # starts at 1 with SLURM
+    config = utils.load_config_entry(
+      FLAGS.config_file, FLAGS.config_idx-1)  # starts at 1 with SLURM
     logging.info(f'loaded config: {str(config)}')
 
     agent_config_kwargs.update(config['agent_config'])
@@ -464,9 +472,9 @@ def run_single():
 
 
   if FLAGS.debug and not FLAGS.subprocess:
-      configs = parallel.get_all_configurations(spaces=sweep(FLAGS.search))
+      first_config = next(parallel.iter_configurations(spaces=sweep(FLAGS.search)))
       first_agent_config, first_env_config = parallel.get_agent_env_configs(
-          config=configs[0])
+          config=first_config)
       agent_config_kwargs.update(first_agent_config)
       env_kwargs.update(first_env_config)
 
@@ -492,17 +500,19 @@ def run_many():
   assert FLAGS.debug is False, 'only run debug if not running many things in parallel'
 
   if FLAGS.parallel == 'ray':
+    space = sweep(FLAGS.search)
     parallel.run_ray(
       wandb_init_kwargs=wandb_init_kwargs,
       use_wandb=FLAGS.use_wandb,
       debug=FLAGS.debug,
       folder=folder,
-      space=sweep(FLAGS.search),
+      space=space,
+      max_t=parallel.max_num_steps(space, default=basics.Config.num_steps),
+      num_actors=FLAGS.num_actors,
+      run_distributed=FLAGS.run_distributed,
       make_program_command=functools.partial(
         parallel.make_program_command,
-        trainer_filename=__file__,
-        run_distributed=FLAGS.run_distributed,
-        num_actors=FLAGS.num_actors),
+        trainer_filename=__file__),
     )
   elif FLAGS.parallel == 'sbatch':
     parallel.run_sbatch(
@@ -515,61 +525,67 @@ def run_many():
       debug=FLAGS.debug_parallel,
       spaces=sweep(FLAGS.search),
       num_actors=FLAGS.num_actors)
+  elif FLAGS.parallel == 'serial':
+    parallel.run_serial(
+      train_fn=train_single,
+      wandb_init_kwargs=wandb_init_kwargs,
+      use_wandb=FLAGS.use_wandb,
+      folder=folder,
+      search_name=FLAGS.search,
+      spaces=sweep(FLAGS.search))
+
+_SWEEPS = {
+  'flat': [
+      {
+          "num_steps": [20e6],
+          "agent": ['flat_q', 'flat_usfa'],
+          "seed": [1],
+          "group": ['obj-test-6'],
+          "env.setting": [0],
+          "samples_per_insert": [10],
+          "epsilon_steps": [6e6],
+          # "env.transfer_task_option": [0],
+          "linear_epsilon": [True, False],
+      },
+  ],
+  'sf': [
+      {
+          "num_steps": [20e6],
+          "agent": ['flat_usfa'],
+          "seed": [1],
+          "group": ['sf-test-6'],
+          "env.setting": [0],
+          "samples_per_insert": [0],
+          "sf_layers": [[128, 128], [512]],
+          "policy_layers": [[], [32], [128]],
+          "linear_epsilon": [False],
+      },
+  ],
+  'speed': [
+      {
+          "agent": ['flat_q', 'flat_usfa'],
+          "seed": [1],
+          "group": ['speed-test-8'],
+          "samples_per_insert": [10],
+          "env.setting": [0],
+      },
+  ],
+  'objects': [
+      {
+          "seed": [5,6,7,8],
+          "agent": ['object_usfa'],
+      }
+  ],
+}
 
 def sweep(search: str = 'default'):
-  if search == 'flat':
-    space = [
-        {
-            "num_steps": tune.grid_search([20e6]),
-            "agent": tune.grid_search(['flat_q', 'flat_usfa']),
-            "seed": tune.grid_search([1]),
-            "group": tune.grid_search(['obj-test-6']),
-            "env.setting": tune.grid_search([0]),
-            "samples_per_insert": tune.grid_search([10]),
-            "epsilon_steps": tune.grid_search([6e6]),
-            # "env.transfer_task_option": tune.grid_search([0]),
-            "linear_epsilon": tune.grid_search([True, False]),
-        },
-    ]
-  elif search == 'sf':
-    space = [
-        {
-            "num_steps": tune.grid_search([20e6]),
-            "agent": tune.grid_search(['flat_usfa']),
-            "seed": tune.grid_search([1]),
-            "group": tune.grid_search(['sf-test-6']),
-            "env.setting": tune.grid_search([0]),
-            "samples_per_insert": tune.grid_search([0]),
-            "sf_layers": tune.grid_search([[128, 128], [512]]),
-            "policy_layers": tune.grid_search([[], [32], [128]]),
-            "linear_epsilon": tune.grid_search([False]),
-        },
-    ]
-  elif search == 'speed':
-    space = [
-        {
-            "agent": tune.grid_search(['flat_q', 'flat_usfa']),
-            "seed": tune.grid_search([1]),
-            "group": tune.grid_search(['speed-test-8']),
-            "samples_per_insert": tune.grid_search([10]),
-            "env.setting": tune.grid_search([0]),
-        },
-    ]
-  elif search == 'objects':
-    space = [
-        {
-            "seed": tune.grid_search([5,6,7,8]),
-            "agent": tune.grid_search(['object_usfa']),
-        }
-    ]
-  else:
+  if search not in _SWEEPS:
     raise NotImplementedError(search)
-
-  return space
+  return copy.deepcopy(_SWEEPS[search])
 
 def main(_):
-  assert FLAGS.parallel in ('ray', 'sbatch', 'none')
-  if FLAGS.parallel in ('ray', 'sbatch'):
+  assert FLAGS.parallel in ('ray', 'sbatch', 'serial', 'none')
+  if FLAGS.parallel in ('ray', 'sbatch', 'serial'):
     run_many()
   else:
     run_single()
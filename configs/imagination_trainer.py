@@ -45,6 +45,7 @@ python configs/imagination_trainer.py \
   --wandb_project=imagination
 
 """
+import copy
 import functools 
 
 import dataclasses
@@ -52,9 +53,6 @@ from absl import flags
 from absl import app
 from absl import logging
 import os
-from ray import tune
-from launchpad.nodes.python.local_multi_processing import PythonProcess
-import launchpad as lp
 
 from acme.jax import networks as networks_lib
 from acme.jax.networks import duelling
@@ -404,6 +402,8 @@ def train_single(
 
   config = experiment_config_inputs.agent_config
   if run_distributed:
+    from launchpad.nodes.python.local_multi_processing import PythonProcess
+    import launchpad as lp
     program = experiments.make_distributed_experiment(
         experiment=experiment,
         num_actors=num_actors)
@@ -471,8 +471,8 @@ def run_single():
   # override with config settings, e.g. from parallel run
   ########################
   if FLAGS.config_file:
-    configs = utils.load_config(FLAGS.config_file)
-    config = configs[FLAGS.config_idx-1]  # starts at 1 with SLURM
+    config = utils.load_config_entry(
+      FLAGS.config_file, FLAGS.config_idx-1)  # starts at 1 with SLURM
     logging.info(f'loaded config: {str(config)}')
 
     agent_config_kwargs.update(config['agent_config'])
@@ -492,9 +492,9 @@ def run_single():
 
 
   if FLAGS.debug and not FLAGS.subprocess:
-      configs = parallel.get_all_configurations(spaces=sweep(FLAGS.search))
+      first_config = next(parallel.iter_configurations(spaces=sweep(FLAGS.search)))
       first_agent_config, first_env_config = parallel.get_agent_env_configs(
-          config=configs[0])
+          config=first_config)
       agent_config_kwargs.update(first_agent_config)
       env_kwargs.update(first_env_config)
 
@@ -520,17 +520,19 @@ def run_many():
   assert FLAGS.debug is False, 'only run debug if not running many things in parallel'
 
   if FLAGS.parallel == 'ray':
+    space = sweep(FLAGS.search)
     parallel.run_ray(
       wandb_init_kwargs=wandb_init_kwargs,
       use_wandb=FLAGS.use_wandb,
       debug=FLAGS.debug,
       folder=folder,
-      space=sweep(FLAGS.search),
+      space=space,
+      max_t=parallel.max_num_steps(space, default=basics.Config.num_steps),
+      num_actors=FLAGS.num_actors,
+      run_distributed=FLAGS.run_distributed,
       make_program_command=functools.partial(
         parallel.make_program_command,
-        trainer_filename=__file__,
-        run_distributed=FLAGS.run_distributed,
-        num_actors=FLAGS.num_actors),
+        trainer_filename=__file__),
     )
   elif FLAGS.parallel == 'sbatch':
     parallel.run_sbatch(
@@ -544,30 +546,28 @@ def run_many():
       spaces=sweep(FLAGS.search),
       num_actors=FLAGS.num_actors)
 
-def sweep(search: str = 'default'):
-  if search == 'initial':
-    space = [
-        {
-            "group": tune.grid_search(['run-2']),
-            "agent": tune.grid_search(['qlearning', 'muzero']),
-            "seed": tune.grid_search([1]),
-            "env.difficulty": tune.grid_search([7]),
-        }
-    ]
-  elif search == 'muzero':
-    space = [
-        {
-            "agent": tune.grid_search(['muzero']),
-            "seed": tune.grid_search([1]),
-            "seed": tune.grid_search([1]),
-            "env.difficulty": tune.grid_search([7]),
-        }
-    ]
+_SWEEPS = {
+  'initial': [
+      {
+          "group": ['run-2'],
+          "agent": ['qlearning', 'muzero'],
+          "seed": [1],
+          "env.difficulty": [7],
+      }
+  ],
+  'muzero': [
+      {
+          "agent": ['muzero'],
+          "seed": [1],
+          "env.difficulty": [7],
+      }
+  ],
+}
 
-  else:
+def sweep(search: str = 'default'):
+  if search not in _SWEEPS:
     raise NotImplementedError(search)
-
-  return space
+  return copy.deepcopy(_SWEEPS[search])
 
 def main(_):
   assert FLAGS.parallel in ('ray', 'sbatch', 'none')
@@ -0,0 +1,465 @@
+"""
+Single entry point for minigrid/BabyAI agents. `--agent` selects a codepath from `_AGENT_REGISTRY` for a single run or a search (a search otherwise uses the agent it sets), so different agents share one module and one JAX compilation cache.
+
+Running experiments:
+--------------------
+
+# DEBUGGING, single stream
+python -m ipdb -c continue configs/trainer.py \
+  --search='qlearning' \
+  --parallel='none' \
+  --run_distributed=False \
+  --debug=True \
+  --use_wandb=False \
+  --wandb_entity=wcarvalho92 \
+  --wandb_project=neurorl_debug
+
+# running a search, single-stream
+python configs/trainer.py \
+  --search='qlearning' \
+  --parallel='sbatch' \
+  --run_distributed=False \
+  --use_wandb=True \
+  --partition=kempner \
+  --account=kempner_fellows \
+  --wandb_entity=wcarvalho92 \
+  --wandb_project=neurorl
+
+# running a search, all trials inside this process
+python configs/trainer.py \
+  --search='qlearning' \
+  --parallel='serial' \
+  --run_distributed=False \
+  --use_wandb=True \
+  --wandb_entity=wcarvalho92 \
+  --wandb_project=neurorl
+
+
+"""
+import copy
+import functools 
+
+import dataclasses
+from absl import flags
+from absl import app
+from absl import logging
+import os
+
+from acme import wrappers as acme_wrappers
+import gymnasium
+import dm_env
+import minigrid
+
+from td_agents import basics
+from td_agents import q_learning
+
+from envs import minigrid_jax
+
+from lib.dm_env_wrappers import GymWrapper, compile_wrapper
+import lib.env_wrappers as env_wrappers
+import lib.experiment_builder as experiment_builder
+import lib.parallel as parallel
+import lib.utils as utils
+from lib.single_thread_experiment import run_experiment
+
+flags.DEFINE_string('config_file', '', 'config file')
+flags.DEFINE_string('search', 'default', 'which search to use.')
+flags.DEFINE_string(
+    'parallel', 'none', "none: run 1 experiment. sbatch: run many experiments with SBATCH. ray: run many experiments with say. use sbatch with SLUM or ray otherwise. serial: run many experiments one after another in this process.")
+flags.DEFINE_bool(
+    'debug', False, 'If in debugging mode, only 1st config is run.')
+flags.DEFINE_bool(
+    'make_path', True, 'Create a path under `FLAGS>folder` for the experiment')
+flags.DEFINE_string(
+    'agent', '', 'if set, overrides the agent of the run/search. see `_AGENT_REGISTRY`.')
+
+FLAGS = flags.FLAGS
+
+@dataclasses.dataclass
+class QlearningConfig(q_learning.Config):
+  q_dim: int = 512
+  prejit: bool = True
+
+  eval_every: int = 100
+  num_eval_episodes: int = 10
+  vectorized_eval: bool = True  # False: run eval episodes one after another
+
+# trial configs are specialized from this with `dataclasses.replace`
+_BASE_QCONFIG = QlearningConfig()
+
+def make_environment(seed: int,
+                     level="BabyAI-GoToRedBallNoDists-v0",
+                     evaluation: bool = False,
+                     use_rgb: bool = False,
+                     **kwargs) -> dm_env.Environment:
+  """Loads environments. For now, just "goto X" from minigrid. change as needed.
+  
+  Args:
+      seed (int): seeds the level generator, so e.g. evaluation environments differ from each other.
+      evaluation (bool, optional): whether evaluation.
+      use_rgb (bool, optional): render RGB partial observations. otherwise, use minigrid's symbolic [7, 7, 3] grid directly.
+  
+  Returns:
+      dm_env.Environment: Multitask environment is returned.
+  """
+  del evaluation
+
+  # create gymnasium.Gym environment
+  # environments: https://minigrid.farama.org/environments/babyai/
+  env = gymnasium.make(level)
+  env.reset(seed=seed)  # later resets continue this random stream
+  if use_rgb:
+    env = minigrid.wrappers.RGBImgPartialObsWrapper(env)
+  env = env_wrappers.DictObservationSpaceWrapper(env)
+
+  # convert to dm_env.Environment enironment
+  env = GymWrapper(env)
+
+  ####################################
+  # ACME wrappers
+  ####################################
+  # add acme wrappers
+  wrapper_list = [
+    compile_wrapper(env.observation_spec()),
+  ]
+
+  env = acme_wrappers.wrap_all(env, wrapper_list)
+  return env
+
+def make_jax_environment(seed: int,
+                         level="BabyAI-GoToRedBallNoDists-v0",
+                         evaluation: bool = False,
+                         use_rgb: bool = False,
+                         num_lanes: int = 0,
+                         **kwargs) -> dm_env.Environment:
+  """Same levels as `make_environment` but simulated in JAX (no gymnasium).
+
+  Level is a static property of the env, so it's baked into the jitted step.
+  NOTE: one lane is not faster than gymnasium, see `envs/minigrid_jax.py`.
+
+  Args:
+      num_lanes (int): if set, return `num_lanes` lanes stepped with one call, with a leading lane axis (e.g. for vectorized evaluation).
+  """
+  del evaluation
+  kwargs.pop('backend', None)
+  env = minigrid_jax.GoToEnv.from_level(level, rgb=use_rgb, **kwargs)
+  if num_lanes:
+    env = minigrid_jax.BatchEnvWrapper(env, num_lanes=num_lanes, seed=seed)
+  else:
+    env = minigrid_jax.EnvWrapper(env, seed=seed)
+
+  wrapper_list = [
+    compile_wrapper(env.observation_spec()),
+  ]
+
+  env = acme_wrappers.wrap_all(env, wrapper_list)
+  return env
+
+def _qlearning_setup(config_kwargs: dict, env_kwargs: dict):
+  config = dataclasses.replace(_BASE_QCONFIG, **config_kwargs)
+  builder = basics.Builder(
+    config=config,
+    get_actor_core_fn=functools.partial(
+      basics.get_actor_core,
+      linear_epsilon=config.linear_epsilon,
+    ),
+    LossFn=q_learning.R2D2LossFn(
+      discount=config.discount,
+      importance_sampling_exponent=config.importance_sampling_exponent,
+      burn_in_length=config.burn_in_length,
+      max_replay_size=config.max_replay_size,
+      max_priority_weight=config.max_priority_weight,
+      bootstrap_n=config.bootstrap_n,
+    ))
+  network_factory = functools.partial(
+          q_learning.make_minigrid_networks,
+          config=config,
+          symbolic=not env_kwargs.get('use_rgb', False))
+  return config, builder, network_factory, env_kwargs
+
+# agent --> fn(config_kwargs, env_kwargs) that returns (config, builder, network_factory, env_kwargs).
+# returned env_kwargs may override the given ones for agent-specific needs.
+_AGENT_REGISTRY = {
+  'qlearning': _qlearning_setup,
+}
+
+def setup_experiment_inputs(
+    agent_config_kwargs: dict=None,
+    env_kwargs: dict=None,
+    debug: bool = False,
+  ):
+  """Setup."""
+  config_kwargs = agent_config_kwargs or dict()
+  env_kwargs = env_kwargs or dict()
+
+  # -----------------------
+  # load agent config, builder, network factory
+  # -----------------------
+  agent = agent_config_kwargs.get('agent', '')
+  assert agent != '', 'please set agent'
+
+  if agent not in _AGENT_REGISTRY:
+    raise NotImplementedError(agent)
+  config, builder, network_factory, env_kwargs = _AGENT_REGISTRY[agent](
+    config_kwargs, env_kwargs)
+
+  # -----------------------
+  # load environment factory
+  # -----------------------
+  backend = env_kwargs.get('backend', 'gymnasium')
+  if backend == 'jax':
+    make_environment_fn = make_jax_environment
+  elif backend == 'gymnasium':
+    make_environment_fn = make_environment
+  else:
+    raise NotImplementedError(backend)
+
+  environment_factory = functools.partial(
+    make_environment_fn,
+    **env_kwargs)
+
+  # -----------------------
+  # setup observer factory for environment
+  # this logs the average every reset=50 episodes (instead of every episode)
+  # -----------------------
+  observers = [
+      utils.LevelAvgReturnObserver(
+        reset=50,
+        get_task_name=lambda e: "task"
+        ),
+      ]
+
+  return experiment_builder.OnlineExperimentConfigInputs(
+    agent=agent,
+    agent_config=config,
+    final_env_kwargs=env_kwargs,
+    builder=builder,
+    network_factory=network_factory,
+    environment_factory=environment_factory,
+    observers=observers,
+  )
+
+def train_single(
+    env_kwargs: dict = None,
+    wandb_init_kwargs: dict = None,
+    agent_config_kwargs: dict = None,
+    log_dir: str = None,
+    num_actors: int = 1,
+    run_distributed: bool = False,
+):
+  del num_actors
+  debug = FLAGS.debug
+
+  experiment_config_inputs = setup_experiment_inputs(
+    agent_config_kwargs=agent_config_kwargs,
+    env_kwargs=env_kwargs,
+    debug=debug)
+
+  # -----------------------
+  # share compiled programs across runs (and trials of a search)
+  # -----------------------
+  config = experiment_config_inputs.agent_config
+  utils.initialize_config_compilation_cache(config, FLAGS.jax_cache_dir)
+
+  logger_factory_kwargs = dict(
+    actor_label="actor",
+    evaluator_label="evaluator",
+    learner_label="learner",
+  )
+
+  experiment = experiment_builder.build_online_experiment_config(
+    experiment_config_inputs=experiment_config_inputs,
+    log_dir=log_dir,
+    wandb_init_kwargs=wandb_init_kwargs,
+    logger_factory_kwargs=logger_factory_kwargs,
+    debug=debug
+  )
+
+  if run_distributed:
+    raise NotImplementedError('distributed not implemented')
+  else:
+    batch_environment_factory = None
+    env_kwargs = experiment_config_inputs.final_env_kwargs
+    if env_kwargs.get('backend', 'gymnasium') == 'jax':
+      batch_environment_factory = functools.partial(
+        make_jax_environment, **env_kwargs)
+    run_experiment(
+      experiment=experiment,
+      eval_every=config.eval_every,
+      num_eval_episodes=config.num_eval_episodes,
+      vectorized_eval=config.vectorized_eval,
+      batch_environment_factory=batch_environment_factory)
+
+def setup_wandb_init_kwargs():
+  if not FLAGS.use_wandb:
+    return dict()
+
+  wandb_init_kwargs = dict(
+      project=FLAGS.wandb_project,
+      entity=FLAGS.wandb_entity,
+      notes=FLAGS.wandb_notes,
+      name=FLAGS.wandb_name,
+      group=FLAGS.search,
+      save_code=False,
+  )
+  return wandb_init_kwargs
+
+def run_single():
+  ########################
+  # default settings
+  ########################
+  env_kwargs = dict()
+  agent_config_kwargs = dict()
+  num_actors = FLAGS.num_actors
+  run_distributed = FLAGS.run_distributed
+  wandb_init_kwargs = setup_wandb_init_kwargs()
+  if FLAGS.debug:
+    agent_config_kwargs.update(dict(
+    ))
+    env_kwargs.update(dict(
+    ))
+
+  folder = FLAGS.folder or os.environ.get('RL_RESULTS_DIR', None)
+  if not folder:
+    folder = '/tmp/rl_results'
+
+  if FLAGS.make_path:
+    # i.e. ${folder}/runs/${date_time}/
+    folder = parallel.gen_log_dir(
+        base_dir=os.path.join(folder, 'rl_results'),
+        hourminute=True,
+        date=True,
+    )
+
+  ########################
+  # override with config settings, e.g. from parallel run
+  ########################
+  if FLAGS.config_file:
+    config = utils.load_config_entry(
+      FLAGS.config_file, FLAGS.config_idx-1)  # starts at 1 with SLURM
+    logging.info(f'loaded config: {str(config)}')
+
+    agent_config_kwargs.update(config['agent_config'])
+    env_kwargs.update(config['env_config'])
+    folder = config['folder']
+
+    num_actors = config['num_actors']
+    run_distributed = config['run_distributed']
+
+    wandb_init_kwargs['group'] = config['wandb_group']
+    wandb_init_kwargs['name'] = config['wandb_name']
+    wandb_init_kwargs['project'] = config['wandb_project']
+    wandb_init_kwargs['entity'] = config['wandb_entity']
+
+    if not config['use_wandb']:
+      wandb_init_kwargs = dict()
+
+
+  if FLAGS.debug and not FLAGS.subprocess:
+      first_config = next(parallel.iter_configurations(spaces=sweep(FLAGS.search)))
+      first_agent_config, first_env_config = parallel.get_agent_env_configs(
+          config=first_config)
+      agent_config_kwargs.update(first_agent_config)
+      env_kwargs.update(first_env_config)
+
+  if FLAGS.agent:
+    assert FLAGS.agent in _AGENT_REGISTRY, f'unknown agent: {FLAGS.agent}'
+    agent_config_kwargs['agent'] = FLAGS.agent
+
+  train_single(
+    wandb_init_kwargs=wandb_init_kwargs,
+    env_kwargs=env_kwargs,
+    agent_config_kwargs=agent_config_kwargs,
+    log_dir=folder,
+    num_actors=num_actors,
+    run_distributed=run_distributed
+    )
+
+def run_many():
+  wandb_init_kwargs = setup_wandb_init_kwargs()
+
+  folder = FLAGS.folder or os.environ.get('RL_RESULTS_DIR', None)
+  if not folder:
+    folder = '/tmp/rl_results_dir'
+
+  assert FLAGS.debug is False, 'only run debug if not running many things in parallel'
+
+  if FLAGS.parallel == 'ray':
+    space = sweep(FLAGS.search)
+    parallel.run_ray(
+      wandb_init_kwargs=wandb_init_kwargs,
+      use_wandb=FLAGS.use_wandb,
+      debug=FLAGS.debug,
+      folder=folder,
+      space=space,
+      max_t=parallel.max_num_steps(space, default=QlearningConfig.num_steps),
+      num_actors=FLAGS.num_actors,
+      run_distributed=FLAGS.run_distributed,
+      make_program_command=functools.partial(
+        parallel.make_program_command,
+        trainer_filename=__file__),
+    )
+  elif FLAGS.parallel == 'sbatch':
+    parallel.run_sbatch(
+      trainer_filename=__file__,
+      wandb_init_kwargs=wandb_init_kwargs,
+      use_wandb=FLAGS.use_wandb,
+      folder=folder,
+      run_distributed=FLAGS.run_distributed,
+      search_name=FLAGS.search,
+      debug=FLAGS.debug_parallel,
+      spaces=sweep(FLAGS.search),
+      num_actors=FLAGS.num_actors)
+  elif FLAGS.parallel == 'serial':
+    parallel.run_serial(
+      train_fn=train_single,
+      wandb_init_kwargs=wandb_init_kwargs,
+      use_wandb=FLAGS.use_wandb,
+      folder=folder,
+      search_name=FLAGS.search,
+      spaces=sweep(FLAGS.search))
+
+_SWEEPS = {
+  'qlearning': [
+      {
+          "agent": ['qlearning'],
+          "seed": [1],
+          "env.level": [
+              "BabyAI-GoToRedBallNoDists-v0",
+              "BabyAI-GoToObjS6-v1",
+          ],
+      }
+  ],
+  'qlearning_jax': [
+      {
+          "agent": ['qlearning'],
+          "seed": [1],
+          "env.backend": ['jax'],
+          "env.level": [
+              "BabyAI-GoToRedBallNoDists-v0",
+              "BabyAI-GoToObjS6-v1",
+          ],
+      }
+  ],
+}
+
+def sweep(search: str = 'default'):
+  if search not in _SWEEPS:
+    raise NotImplementedError(search)
+  space = copy.deepcopy(_SWEEPS[search])
+
+  if FLAGS.agent:
+    assert FLAGS.agent in _AGENT_REGISTRY, f'unknown agent: {FLAGS.agent}'
+    space = [dict(s, agent=[FLAGS.agent]) for s in space]
+
+  return space
+
+def main(_):
+  assert FLAGS.parallel in ('ray', 'sbatch', 'serial', 'none')
+  if FLAGS.parallel in ('ray', 'sbatch', 'serial'):
+    run_many()
+  else:
+    run_single()
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,415 @@
+"""JAX re-implementation of the single-room BabyAI "GoTo" levels.
+
+Functional, gymnax-style API (pure functions of a PRNG key and env state):
+
+  obs, state = env.reset(key)
+  obs, state, reward, done, info = env.step(key, state, action)
+
+`EnvWrapper` exposes one lane to acme's loops (one jitted call + device-to-host
+copy per step), so training is not faster than with the gymnasium levels.
+`BatchEnvWrapper` steps many lanes with one jitted, vmapped call. It is used
+for vectorized evaluation (see `lib/single_thread_experiment.py`).
+
+The grid is symbolic (object type + color per cell, same indices as minigrid).
+Symbolic observations use minigrid's `Grid.encode` layout ([x, y, channel]).
+Images are rendered with a lookup table instead of minigrid's python renderer.
+
+NOTE: cells outside the room are "unseen", which is what minigrid's visibility
+computation gives for a single room. pickup/drop/toggle are no-ops since GoTo
+only requires facing the object.
+"""
+import functools
+from typing import Dict, NamedTuple, Optional
+
+import dm_env
+from acme import specs, types
+import jax
+import jax.numpy as jnp
+import numpy as np
+import tree
+
+# same indices as minigrid.core.constants
+OBJECT_TO_IDX = {
+  'unseen': 0,
+  'empty': 1,
+  'wall': 2,
+  'floor': 3,
+  'door': 4,
+  'key': 5,
+  'ball': 6,
+  'box': 7,
+  'goal': 8,
+  'lava': 9,
+  'agent': 10,
+}
+COLOR_TO_IDX = {
+  'red': 0,
+  'green': 1,
+  'blue': 2,
+  'purple': 3,
+  'yellow': 4,
+  'grey': 5,
+}
+COLORS = np.array([
+  [255, 0, 0],
+  [0, 255, 0],
+  [0, 0, 255],
+  [112, 39, 195],
+  [255, 255, 0],
+  [100, 100, 100],
+], dtype=np.uint8)
+
+# right, down, left, up
+DIR_TO_VEC = np.array([[1, 0], [0, 1], [-1, 0], [0, -1]], dtype=np.int32)
+
+OBJECT_TYPES = np.array(
+  [OBJECT_TO_IDX[o] for o in ('key', 'ball', 'box')], dtype=np.int8)
+
+NUM_ACTIONS = 7  # left, right, forward, pickup, drop, toggle, done
+LEFT, RIGHT, FORWARD = 0, 1, 2
+
+# level name --> GoToEnv kwargs
+LEVELS = {
+  "BabyAI-GoToRedBallNoDists-v0": dict(
+    room_size=8, num_dists=0, goal_type='ball', goal_color='red'),
+  "BabyAI-GoToRedBallGrey-v0": dict(
+    room_size=8, num_dists=7, goal_type='ball', goal_color='red',
+    dist_color='grey'),
+  "BabyAI-GoToRedBall-v0": dict(
+    room_size=8, num_dists=7, goal_type='ball', goal_color='red'),
+  "BabyAI-GoToObj-v0": dict(room_size=8, num_dists=0),
+  "BabyAI-GoToObjS4-v0": dict(room_size=4, num_dists=0),
+  "BabyAI-GoToObjS6-v1": dict(room_size=6, num_dists=0),
+  "BabyAI-GoToLocal-v0": dict(room_size=8, num_dists=7),
+}
+
+
+class EnvState(NamedTuple):
+  types: jax.Array  # [H, W] int8
+  colors: jax.Array  # [H, W] int8
+  agent_pos: jax.Array  # [2] (x, y)
+  agent_dir: jax.Array  # []
+  goal_type: jax.Array  # []
+  goal_color: jax.Array  # []
+  time: jax.Array  # []
+
+
+class GoToEnv:
+  """Single room, "go to the {color} {type}"."""
+
+  def __init__(self,
+               room_size: int = 8,
+               num_dists: int = 0,
+               goal_type: Optional[str] = None,
+               goal_color: Optional[str] = None,
+               dist_color: Optional[str] = None,
+               agent_view_size: int = 7,
+               tile_size: int = 8,
+               max_steps: Optional[int] = None,
+               rgb: bool = True):
+    """
+    Args:
+        room_size (int): grid size, including the border walls.
+        num_dists (int): number of distractor objects.
+        goal_type (str, optional): fixed goal type. random if None.
+        goal_color (str, optional): fixed goal color. random if None.
+        dist_color (str, optional): fixed color of distractors. random if None.
+        agent_view_size (int): size of egocentric partial view.
+        tile_size (int): pixels per cell when rendering.
+        max_steps (int, optional): defaults to BabyAI's room_size**2 (one room).
+        rgb (bool): if True, obs['image'] is rendered RGB. Otherwise the symbolic [V, V, 3] (type, color, state) grid, indexed [x, y] like minigrid.
+    """
+    # hashable settings, so jitted functions are shared by equal envs (see `EnvWrapper`)
+    self._settings = (room_size, num_dists, goal_type, goal_color, dist_color,
+                      agent_view_size, tile_size, max_steps, rgb)
+    self.room_size = room_size
+    self.num_dists = num_dists
+    self.goal_type = OBJECT_TO_IDX[goal_type] if goal_type else None
+    self.goal_color = COLOR_TO_IDX[goal_color] if goal_color else None
+    self.dist_color = COLOR_TO_IDX[dist_color] if dist_color else None
+    self.agent_view_size = agent_view_size
+    self.tile_size = tile_size
+    self.max_steps = max_steps or room_size**2
+    self.rgb = rgb
+
+    # [type, color] --> rgb. everything not listed is black.
+    tiles = np.zeros((len(OBJECT_TO_IDX), len(COLORS), 3), dtype=np.uint8)
+    tiles[OBJECT_TO_IDX['wall']] = COLORS[COLOR_TO_IDX['grey']]
+    tiles[OBJECT_TO_IDX['floor']] = COLORS // 2
+    for obj in ('door', 'key', 'ball', 'box', 'goal'):
+      tiles[OBJECT_TO_IDX[obj]] = COLORS
+    tiles[OBJECT_TO_IDX['agent']] = COLORS[COLOR_TO_IDX['red']]
+    self._tiles = jnp.asarray(tiles)
+
+  @classmethod
+  def from_level(cls, level: str, **kwargs):
+    return cls(**LEVELS[level], **kwargs)
+
+  def __hash__(self):
+    return hash(self._settings)
+
+  def __eq__(self, other):
+    return isinstance(other, GoToEnv) and self._settings == other._settings
+
+  @property
+  def image_shape(self):
+    view = self.agent_view_size
+    if self.rgb:
+      return (view*self.tile_size, view*self.tile_size, 3)
+    return (view, view, 3)
+
+  def reset(self, key: jax.Array):
+    size = self.room_size
+    interior = size - 2
+    num_objects = self.num_dists + 1
+    key_pos, key_dir, key_type, key_color = jax.random.split(key, 4)
+
+    # sample distinct cells for agent + objects
+    cells = jax.random.choice(
+      key_pos, interior*interior, shape=(num_objects + 1,), replace=False)
+    xs = cells % interior + 1
+    ys = cells // interior + 1
+
+    obj_types = jax.random.choice(key_type, OBJECT_TYPES, shape=(num_objects,))
+    obj_colors = jax.random.randint(
+      key_color, (num_objects,), 0, len(COLORS)).astype(jnp.int8)
+    if self.dist_color is not None:
+      obj_colors = jnp.full_like(obj_colors, self.dist_color)
+    # first object is the goal
+    if self.goal_type is not None:
+      obj_types = obj_types.at[0].set(self.goal_type)
+    if self.goal_color is not None:
+      obj_colors = obj_colors.at[0].set(self.goal_color)
+
+    types = jnp.full((size, size), OBJECT_TO_IDX['wall'], dtype=jnp.int8)
+    types = types.at[1:-1, 1:-1].set(OBJECT_TO_IDX['empty'])
+    types = types.at[ys[1:], xs[1:]].set(obj_types)
+    # walls are grey, empty cells have color 0 (as in minigrid's encoding)
+    colors = jnp.full((size, size), COLOR_TO_IDX['grey'], dtype=jnp.int8)
+    colors = colors.at[1:-1, 1:-1].set(0)
+    colors = colors.at[ys[1:], xs[1:]].set(obj_colors)
+
+    state = EnvState(
+      types=types,
+      colors=colors,
+      agent_pos=jnp.stack((xs[0], ys[0])).astype(jnp.int32),
+      agent_dir=jax.random.randint(key_dir, (), 0, 4),
+      goal_type=obj_types[0],
+      goal_color=obj_colors[0],
+      time=jnp.array(0, dtype=jnp.int32),
+    )
+    return self.observation(state), state
+
+  def step_env(self, state: EnvState, action: jax.Array):
+    """Transition without automatic resetting."""
+    agent_dir = jnp.where(action == LEFT, (state.agent_dir - 1) % 4, state.agent_dir)
+    agent_dir = jnp.where(action == RIGHT, (agent_dir + 1) % 4, agent_dir)
+
+    front = state.agent_pos + jnp.asarray(DIR_TO_VEC)[state.agent_dir]
+    front_type = state.types[front[1], front[0]]
+    can_move = (front_type == OBJECT_TO_IDX['empty']) | (
+      front_type == OBJECT_TO_IDX['floor'])
+    agent_pos = jnp.where(
+      (action == FORWARD) & can_move, front, state.agent_pos)
+
+    state = state._replace(
+      agent_pos=agent_pos,
+      agent_dir=agent_dir,
+      time=state.time + 1)
+
+    # success when facing the goal object (see BabyAI's GoToInstr)
+    front = state.agent_pos + jnp.asarray(DIR_TO_VEC)[state.agent_dir]
+    success = (state.types[front[1], front[0]] == state.goal_type) & (
+      state.colors[front[1], front[0]] == state.goal_color)
+    truncated = state.time >= self.max_steps
+
+    reward = jnp.where(
+      success, 1.0 - 0.9*(state.time/self.max_steps), 0.0).astype(jnp.float32)
+    done = success | truncated
+    info = dict(truncated=truncated & ~success)
+    return self.observation(state), state, reward, done, info
+
+  def step(self, key: jax.Array, state: EnvState, action: jax.Array):
+    """Transition that automatically resets when episode ends."""
+    obs, state, reward, done, info = self.step_env(state, action)
+    obs_reset, state_reset = self.reset(key)
+    state = jax.tree_util.tree_map(
+      lambda r, s: jnp.where(done, r, s), state_reset, state)
+    obs = jax.tree_util.tree_map(
+      lambda r, o: jnp.where(done, r, o), obs_reset, obs)
+    return obs, state, reward, done, info
+
+  def partial_view(self, state: EnvState):
+    """Egocentric [V, V] view, indexed [row, col]. Agent is at bottom-center, facing up."""
+    view = self.agent_view_size
+    # pad with unseen cells so that view never indexes outside of grid
+    types = jnp.pad(state.types, view, constant_values=OBJECT_TO_IDX['unseen'])
+    colors = jnp.pad(state.colors, view, constant_values=0)
+
+    forward = jnp.asarray(DIR_TO_VEC)[state.agent_dir]
+    right = jnp.stack((-forward[1], forward[0]))
+    rows, cols = jnp.meshgrid(jnp.arange(view), jnp.arange(view), indexing='ij')
+    ahead = view - 1 - rows
+    side = cols - view//2
+    x = state.agent_pos[0] + forward[0]*ahead + right[0]*side + view
+    y = state.agent_pos[1] + forward[1]*ahead + right[1]*side + view
+    return types[y, x], colors[y, x]
+
+  def render(self, types: jax.Array, colors: jax.Array):
+    """Lookup-table render of a symbolic view to RGB."""
+    view = self.agent_view_size
+    types = types.at[view - 1, view//2].set(OBJECT_TO_IDX['agent'])
+    image = self._tiles[types, colors]
+    image = jnp.repeat(image, self.tile_size, axis=0)
+    return jnp.repeat(image, self.tile_size, axis=1)
+
+  def observation(self, state: EnvState) -> Dict[str, jax.Array]:
+    types, colors = self.partial_view(state)
+    if self.rgb:
+      image = self.render(types, colors)
+    else:
+      # [row, col] --> [x, y], as minigrid's Grid.encode. agent is at [V//2, V-1]
+      image = jnp.stack(
+        (types.T, colors.T, jnp.zeros_like(types)), axis=-1).astype(jnp.uint8)
+    return dict(
+      image=image,
+      direction=state.agent_dir.astype(jnp.int32),
+      mission=jnp.stack((state.goal_type, state.goal_color)).astype(jnp.uint8),
+    )
+
+  def observation_spec(self) -> Dict[str, specs.Array]:
+    return dict(
+      image=specs.BoundedArray(
+        shape=self.image_shape, dtype=np.uint8,
+        minimum=0, maximum=255, name='image'),
+      direction=specs.BoundedArray(
+        shape=(), dtype=np.int32, minimum=0, maximum=3, name='direction'),
+      mission=specs.BoundedArray(
+        shape=(2,), dtype=np.uint8,
+        minimum=0, maximum=len(OBJECT_TO_IDX) - 1, name='mission'),
+    )
+
+  def action_spec(self) -> specs.DiscreteArray:
+    return specs.DiscreteArray(
+      num_values=NUM_ACTIONS, dtype=np.int32, name='action')
+
+
+# env is static, so these compile once per env setting and are shared by all
+# wrappers. on cpu, like acme's actors, so observations need no device transfer.
+_reset = jax.jit(GoToEnv.reset, static_argnums=0, backend='cpu')
+_step_env = jax.jit(GoToEnv.step_env, static_argnums=0, backend='cpu')
+
+@functools.partial(jax.jit, static_argnums=0, backend='cpu')
+def _reset_lanes(environment: GoToEnv, keys: jax.Array):
+  return jax.vmap(environment.reset)(keys)
+
+@functools.partial(jax.jit, static_argnums=0, backend='cpu')
+def _step_lanes(environment: GoToEnv, state: EnvState, action: jax.Array):
+  return jax.vmap(environment.step_env)(state, action)
+
+
+class EnvWrapper(dm_env.Environment):
+  """Wraps a single GoToEnv lane as a dm_env.Environment for acme loops."""
+
+  def __init__(self, environment: GoToEnv, seed: int = 0):
+    self._environment = environment
+    self._key = jax.random.PRNGKey(seed)
+    self._reset_next_step = True
+    self._state = None
+
+  def reset(self) -> dm_env.TimeStep:
+    self._reset_next_step = False
+    self._key, key = jax.random.split(self._key)
+    observation, self._state = _reset(self._environment, key)
+    return dm_env.restart(tree.map_structure(np.asarray, observation))
+
+  def step(self, action: types.NestedArray) -> dm_env.TimeStep:
+    if self._reset_next_step:
+      return self.reset()
+    observation, self._state, reward, done, info = _step_env(
+      self._environment, self._state, action)
+    observation, reward, done, truncated = jax.device_get(
+      (observation, reward, done, info['truncated']))
+    self._reset_next_step = bool(done)
+
+    reward = np.float32(reward)
+    if truncated:
+      return dm_env.truncation(reward, observation)
+    if done:
+      return dm_env.termination(reward, observation)
+    return dm_env.transition(reward, observation)
+
+  def observation_spec(self) -> types.NestedSpec:
+    return self._environment.observation_spec()
+
+  def action_spec(self) -> types.NestedSpec:
+    return self._environment.action_spec()
+
+  def reward_spec(self) -> specs.Array:
+    return specs.Array(shape=(), dtype=np.float32, name='reward')
+
+  @property
+  def environment(self) -> GoToEnv:
+    return self._environment
+
+
+def _batch_spec(spec: specs.Array, num_lanes: int) -> specs.Array:
+  if isinstance(spec, specs.DiscreteArray):
+    return specs.BoundedArray(
+      shape=(num_lanes,), dtype=spec.dtype,
+      minimum=0, maximum=spec.num_values - 1, name=spec.name)
+  return spec.replace(shape=(num_lanes,) + spec.shape)
+
+
+class BatchEnvWrapper(dm_env.Environment):
+  """Wraps `num_lanes` GoToEnv lanes as one dm_env.Environment, stepped with one jitted, vmapped call.
+
+  Specs and timesteps have a leading [num_lanes] axis. Lanes whose episode ended are not reset, so call `reset` once all of them are done.
+  """
+
+  def __init__(self, environment: GoToEnv, num_lanes: int, seed: int = 0):
+    self._environment = environment
+    self._num_lanes = num_lanes
+    self._key = jax.random.PRNGKey(seed)
+    self._state = None
+
+  def reset(self) -> dm_env.TimeStep:
+    self._key, key = jax.random.split(self._key)
+    observation, self._state = _reset_lanes(
+      self._environment, jax.random.split(key, self._num_lanes))
+    return dm_env.TimeStep(
+      step_type=np.full(self._num_lanes, dm_env.StepType.FIRST),
+      reward=None,
+      discount=None,
+      observation=jax.device_get(observation))
+
+  def step(self, action: types.NestedArray) -> dm_env.TimeStep:
+    observation, self._state, reward, done, info = _step_lanes(
+      self._environment, self._state, jnp.asarray(action, dtype=jnp.int32))
+    observation, reward, done, truncated = jax.device_get(
+      (observation, reward, done, info['truncated']))
+    return dm_env.TimeStep(
+      step_type=np.where(done, dm_env.StepType.LAST, dm_env.StepType.MID),
+      reward=np.asarray(reward, dtype=np.float32),
+      discount=np.where(done & ~truncated, 0.0, 1.0).astype(np.float32),
+      observation=observation)
+
+  def observation_spec(self) -> types.NestedSpec:
+    return tree.map_structure(
+      lambda s: _batch_spec(s, self._num_lanes),
+      self._environment.observation_spec())
+
+  def action_spec(self) -> types.NestedSpec:
+    return _batch_spec(self._environment.action_spec(), self._num_lanes)
+
+  def reward_spec(self) -> specs.Array:
+    return specs.Array(shape=(self._num_lanes,), dtype=np.float32, name='reward')
+
+  def discount_spec(self) -> specs.BoundedArray:
+    return specs.BoundedArray(
+      shape=(self._num_lanes,), dtype=np.float32,
+      minimum=0., maximum=1., name='discount')
+
+  @property
+  def environment(self) -> GoToEnv:
+    return self._environment
@@ -4,6 +4,8 @@ from typing import Any, Dict, Optional
 
 from acme import specs
 from acme import types
+from acme.wrappers import base
+from acme.wrappers import observation_action_reward
 
 import dm_env
 import gym
@@ -147,3 +149,164 @@ def _convert_to_spec(space: gym.Space,
 
   else:
     raise ValueError('Unexpected gym space: {}'.format(space))
+
+
+def _single_precision_dtype(dtype) -> np.dtype:
+  """Same conversion as acme's SinglePrecisionWrapper."""
+  dtype = np.dtype(dtype)
+  if dtype == np.float64:
+    return np.dtype(np.float32)
+  elif dtype == np.int64:
+    return np.dtype(np.int32)
+  return dtype
+
+
+def _single_precision_spec(spec: specs.Array) -> specs.Array:
+  return spec.replace(dtype=_single_precision_dtype(spec.dtype))
+
+
+class ObservationActionRewardSinglePrecision(base.EnvironmentWrapper):
+  """Same as wrapping with acme's ObservationActionRewardWrapper then SinglePrecisionWrapper, but in one layer.
+
+  Dtypes are computed once from the specs so no spec tree is walked at step time. For dict observations, only keys whose dtype changes are cast.
+  """
+
+  def __init__(self, environment: dm_env.Environment):
+    super().__init__(environment)
+    self._action_spec = tree.map_structure(
+      _single_precision_spec, environment.action_spec())
+    self._reward_spec = tree.map_structure(
+      _single_precision_spec, environment.reward_spec())
+    self._discount_spec = tree.map_structure(
+      _single_precision_spec, environment.discount_spec())
+    self._inner_observation_spec = tree.map_structure(
+      _single_precision_spec, environment.observation_spec())
+
+    obs_spec = environment.observation_spec()
+    self._cast_keys = None
+    if isinstance(obs_spec, dict):
+      self._cast_keys = {
+        k: self._inner_observation_spec[k].dtype
+        for k, v in obs_spec.items() if self._inner_observation_spec[k].dtype != v.dtype}
+
+  def _cast_observation(self, observation):
+    if self._cast_keys is None:
+      return tree.map_structure(
+        lambda x, s: np.asarray(x, dtype=s.dtype),
+        observation, self._inner_observation_spec)
+
+    observation = dict(observation)
+    for key, dtype in self._cast_keys.items():
+      observation[key] = np.asarray(observation[key], dtype=dtype)
+    return observation
+
+  def _convert(self, timestep: dm_env.TimeStep, action, reward) -> dm_env.TimeStep:
+    cast = lambda x, s: np.asarray(x, dtype=s.dtype)
+    action = tree.map_structure(cast, action, self._action_spec)
+    reward = tree.map_structure(cast, reward, self._reward_spec)
+    discount = timestep.discount
+    if discount is not None:
+      discount = tree.map_structure(cast, discount, self._discount_spec)
+
+    return timestep._replace(
+      observation=observation_action_reward.OAR(
+        observation=self._cast_observation(timestep.observation),
+        action=action,
+        reward=reward),
+      reward=reward if timestep.reward is not None else None,
+      discount=discount)
+
+  def reset(self) -> dm_env.TimeStep:
+    action = tree.map_structure(
+      lambda x: x.generate_value(), self._environment.action_spec())
+    reward = tree.map_structure(
+      lambda x: x.generate_value(), self._environment.reward_spec())
+    timestep = self._environment.reset()
+    return self._convert(timestep, action, reward)
+
+  def step(self, action) -> dm_env.TimeStep:
+    timestep = self._environment.step(action)
+    return self._convert(timestep, action, timestep.reward)
+
+  def observation_spec(self):
+    return observation_action_reward.OAR(
+      observation=self._inner_observation_spec,
+      action=self._action_spec,
+      reward=self._reward_spec)
+
+  def action_spec(self):
+    return self._action_spec
+
+  def reward_spec(self):
+    return self._reward_spec
+
+  def discount_spec(self):
+    return self._discount_spec
+
+
+class _CompiledObservationActionRewardSinglePrecision(
+    ObservationActionRewardSinglePrecision):
+  """Base of classes generated by `compile_wrapper`. Requires array (non-nested) action/reward/discount specs."""
+
+  def __init__(self, environment: dm_env.Environment):
+    super().__init__(environment)
+    for spec in (self._action_spec, self._reward_spec, self._discount_spec):
+      if not isinstance(spec, specs.Array):
+        raise ValueError(f'expected array spec, got: {spec}')
+    self._action_dtype = self._action_spec.dtype
+    self._reward_dtype = self._reward_spec.dtype
+    self._discount_dtype = self._discount_spec.dtype
+
+
+# observation spec --> generated wrapper class
+_COMPILED_WRAPPERS: Dict[str, type] = {}
+
+
+def compile_wrapper(observation_spec) -> type:
+  """Generate an `ObservationActionRewardSinglePrecision` specialized to `observation_spec`.
+
+  Puts action + reward in the observation and casts it to single precision (cheaper to compute with) in one pass.
+
+  `_convert` is generated with `exec` so that observation keys and cast dtypes are hard-coded and no spec is looked up at step time. Only flat dict observation specs are specialized, anything else returns `ObservationActionRewardSinglePrecision`. Classes are cached by spec.
+  """
+  if not (isinstance(observation_spec, dict) and all(
+      isinstance(k, str) and isinstance(s, specs.Array)
+      for k, s in observation_spec.items())):
+    return ObservationActionRewardSinglePrecision
+
+  spec_key = repr([(k, s.shape, np.dtype(s.dtype).str)
+                   for k, s in observation_spec.items()])
+  if spec_key in _COMPILED_WRAPPERS:
+    return _COMPILED_WRAPPERS[spec_key]
+
+  casts = []
+  for key, spec in observation_spec.items():
+    dtype = _single_precision_dtype(spec.dtype)
+    if dtype != spec.dtype:
+      casts.append(
+        f"  observation[{key!r}] = asarray(observation[{key!r}], dtype=np.{dtype.name})")
+
+  source = '\n'.join([
+    "def _convert(self, timestep, action, reward):",
+    "  observation = dict(timestep.observation)",
+    *casts,
+    "  action = asarray(action, dtype=self._action_dtype)",
+    "  reward = asarray(reward, dtype=self._reward_dtype)",
+    "  discount = timestep.discount",
+    "  if discount is not None:",
+    "    discount = asarray(discount, dtype=self._discount_dtype)",
+    "  return timestep._replace(",
+    "    observation=OAR(observation=observation, action=action, reward=reward),",
+    "    reward=reward if timestep.reward is not None else None,",
+    "    discount=discount)",
+  ])
+  namespace = dict(
+    np=np, asarray=np.asarray, OAR=observation_action_reward.OAR)
+  exec(source, namespace)
+
+  wrapper_cls = type(
+    f'CompiledObservationActionRewardSinglePrecision{len(_COMPILED_WRAPPERS)}',
+    (_CompiledObservationActionRewardSinglePrecision,),
+    dict(_convert=namespace['_convert'], _source=source))
+  _COMPILED_WRAPPERS[spec_key] = wrapper_cls
+  return wrapper_cls
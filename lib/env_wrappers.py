@@ -355,8 +355,10 @@ class DictObservationSpaceWrapper(minigrid.wrappers.DictObservationSpaceWrapper)
       self.observation_space = spaces.Dict(
           {
              **self.observation_space.spaces,
+             # int32 so no single-precision cast is needed per step
              "mission": spaces.MultiDiscrete(
-                [len(self.word_dict.keys())] * max_words_in_mission
+                [len(self.word_dict.keys())] * max_words_in_mission,
+                dtype=np.int32,
             ),
           }
       )
@@ -364,7 +366,7 @@ class DictObservationSpaceWrapper(minigrid.wrappers.DictObservationSpaceWrapper)
     obs["mission"] = self.string_to_indices(obs["mission"])
     assert len(obs["mission"]) < self.max_words_in_mission
     obs["mission"] += [0] * (self.max_words_in_mission - len(obs["mission"]))
-    obs["mission"] = np.array(obs["mission"])
+    obs["mission"] = np.array(obs["mission"], dtype=np.int32)
     return obs
 
 def main():
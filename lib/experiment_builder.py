@@ -68,6 +68,9 @@ flags.DEFINE_string('wandb_group', '', 'same as wandb group. way to group runs.'
 flags.DEFINE_string('wandb_name', '', 'name of run. way to group runs.')
 flags.DEFINE_string('wandb_notes', '', 'notes for wandb.')
 flags.DEFINE_string('folder', '', 'folder for experiments.')
+flags.DEFINE_string(
+    'jax_cache_dir', '',
+    'JAX persistent compilation cache. defaults to ${RL_RESULTS_DIR}/jax_cache.')
 
 FLAGS = flags.FLAGS
 
@@ -130,7 +133,7 @@ def setup_logger_factory(
       wandb.init(**wandb_init_kwargs)
 
     if name == 'actor':
-      return experiment_logger.make_logger(
+      logger = experiment_logger.make_logger(
           log_dir=log_dir,
           label=actor_label,
           time_delta=0.0,
@@ -138,6 +141,8 @@ def setup_logger_factory(
           steps_key=steps_key,
           save_data=task_id == 0,
           use_wandb=use_wandb)
+      return experiment_logger.ReportFilter(
+          logger, steps_key=steps_key or 'actor_steps')
     elif name == 'evaluator':
       return experiment_logger.make_logger(
           log_dir=log_dir,
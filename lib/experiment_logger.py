@@ -208,4 +208,28 @@ class HasKeyFilter(base.Logger):
       self._to.write(values)
 
   def close(self):
-    self._to.close()
\ No newline at end of file
+    self._to.close()
+class ReportFilter(base.Logger):
+  """Logger which passes the overall average return of `utils.LevelAvgReturnObserver` to `utils.report_metrics`, timed by `steps_key`.
+
+  Meant for the training loop's logger, so that only training steps count (e.g. as ray tune's time for early-stopping).
+  """
+
+  def __init__(self, to: base.Logger, steps_key: str = 'actor_steps',
+               suffix: str = '/0.overall/avg_return'):
+    self._to = to
+    self._steps_key = steps_key
+    self._suffix = suffix
+
+  def write(self, values: base.LoggingData):
+    if self._steps_key in values:
+      for key, value in values.items():
+        if key.endswith(self._suffix):
+          data_utils.report_metrics({
+            'env_steps': int(values[self._steps_key]),
+            'actor/episode_return': float(value)})
+          break
+    self._to.write(values)
+
+  def close(self):
+    self._to.close()
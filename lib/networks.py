@@ -5,6 +5,7 @@ from typing import Optional, Sequence, Callable, Tuple, Dict
 import chex
 import haiku as hk
 import jax
+import jmp
 import jax.numpy as jnp
 
 from acme import types
@@ -77,6 +78,65 @@ class AtariVisionTorso(hk.Module):
 
     return self.out_net(flat)
 
+def set_compute_dtype(module_cls, dtype: str = 'float32'):
+  """Set compute dtype of all `module_cls` modules (e.g. bfloat16). Params and outputs stay float32 so downstream modules (e.g. the Q-head) are unaffected."""
+  policy = jmp.get_policy(f'params=float32,compute={dtype},output=float32')
+  hk.mixed_precision.set_policy(module_cls, policy)
+
+class SymbolicVisionTorso(hk.Module):
+  """Torso for minigrid's symbolic [H, W, 3] (type, color, state) grid. Embeds object types, one-hots colors/states, then applies a small conv stack."""
+
+  def __init__(self,
+               num_types: int = 11,
+               num_colors: int = 6,
+               num_states: int = 3,
+               type_dim: int = 16,
+               conv_dim: int = 32,
+               flatten=True,
+               out_dim=0):
+    super().__init__(name='symbolic_torso')
+    self.num_types = num_types
+    self.num_colors = num_colors
+    self.num_states = num_states
+    self.type_dim = type_dim
+    self._network = hk.Sequential([
+        hk.Conv2D(conv_dim, [3, 3], 1),
+        jax.nn.relu,
+        hk.Conv2D(conv_dim, [3, 3], 1),
+        jax.nn.relu,
+    ])
+
+    self.flatten = flatten
+    if out_dim:
+      self.out_net = hk.Linear(out_dim)
+    else:
+      self.out_net = lambda x: x
+
+  def __call__(self, inputs: Image) -> jnp.ndarray:
+    inputs_rank = jnp.ndim(inputs)
+    batched_inputs = inputs_rank == 4
+    if inputs_rank < 3 or inputs_rank > 4:
+      raise ValueError('Expected input BHWC or HWC. Got rank %d' % inputs_rank)
+
+    inputs = inputs.astype(jnp.int32)
+    types = hk.Embed(
+      vocab_size=self.num_types,
+      embed_dim=self.type_dim)(inputs[..., 0])
+    colors = jax.nn.one_hot(inputs[..., 1], self.num_colors, dtype=types.dtype)
+    states = jax.nn.one_hot(inputs[..., 2], self.num_states, dtype=types.dtype)
+
+    outputs = self._network(
+      jnp.concatenate((types, colors, states), axis=-1))
+    if not self.flatten:
+      return outputs
+
+    if batched_inputs:
+      flat = jnp.reshape(outputs, [outputs.shape[0], -1])  # [B, D]
+    else:
+      flat = jnp.reshape(outputs, [-1])  # [D]
+
+    return self.out_net(flat)
+
 class LanguageEncoder(hk.Module):
   """Module that embed words and then runs them through GRU. The Token`0` is treated as padding and masked out."""
 
@@ -139,6 +199,7 @@ class OarTorso(hk.Module):
                flatten_image: bool = True,
                output_fn: Callable[[Image, Task, Action, Reward], Array] = concat,
                w_init: Optional[hk.initializers.Initializer] = None,
+               image_scale: float = 255.0,
                name='torso'):
     super().__init__(name=name)
     if task_encoder is None:
@@ -150,6 +211,7 @@ class OarTorso(hk.Module):
     self._flatten_image = flatten_image
     self._task_encoder = task_encoder
     self._w_init = w_init
+    self._image_scale = image_scale
 
   def __call__(self, inputs: observation_action_reward.OAR):
     if len(inputs.observation['image'].shape) == 3:
@@ -173,7 +235,7 @@ class OarTorso(hk.Module):
 
     # compute image encoding
     inputs = jax.tree_map(lambda x: x.astype(jnp.float32), inputs)
-    image = self._vision_torso(inputs.observation['image']/255.0)
+    image = self._vision_torso(inputs.observation['image']/self._image_scale)
     if self._flatten_image:
       image = jnp.reshape(image, (-1))
 
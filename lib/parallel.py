@@ -5,12 +5,14 @@ from absl import logging
 
 import multiprocessing as mp
 import os
+import signal
+import tempfile
 import time
 import datetime
-import pickle 
+import inspect
+import json
 
 from pathlib import Path
-from ray import tune
 import subprocess
 
 from acme.utils import paths
@@ -29,6 +31,7 @@ flags.DEFINE_integer('num_gpus', 1, 'number of gpus.')
 flags.DEFINE_bool('skip', False, 'whether to skip experiments that have already run.')
 flags.DEFINE_bool('subprocess', False, 'label for whether this run is a subprocess.')
 flags.DEFINE_bool('debug_parallel', False, 'whether to debug parallel runs.')
+flags.DEFINE_string('scheduler', 'asha', 'ray only. early-stopping scheduler: none, asha, median.')
 
 FLAGS = flags.FLAGS
 
@@ -67,36 +70,21 @@ def gen_log_dir(
     return str(path)
 
 def make_program_command(
-    folder: str,
-    agent_config: str,
-    env_config: str,
-    wandb_init_kwargs: dict,
-    filename: str = '',
-    num_actors: int = 2,
-    run_distributed: bool = False,
+    config_file: str,
+    trainer_filename: str = '',
+    config_idx: int = 1,
     **kwargs,
 ):
-  wandb_project = wandb_init_kwargs['project']
-  wandb_group = wandb_init_kwargs['group']
-  wandb_name = wandb_init_kwargs['name']
-  wandb_entity = wandb_init_kwargs['entity']
-
-  assert filename, 'please provide file'
-  str = f"""python {filename}
-		--use_wandb=True
-		--wandb_project='{wandb_project}'
-		--wandb_entity='{wandb_entity}'
-		--wandb_group='{wandb_group}'
-    --wandb_name='{wandb_name}'
-    --folder='{folder}'
-    --agent_config='{agent_config}'
-    --env_config='{env_config}'
-    --num_actors={num_actors}
-    --run_distributed={run_distributed}
-    --parallel=False
+  """Command that runs entry `config_idx` (starts at 1) of `config_file` with `trainer_filename`."""
+  assert trainer_filename, 'please provide file'
+  str = f"""python {trainer_filename}
+    --config_file='{config_file}'
+    --config_idx={config_idx}
+    --parallel=none
+    --subprocess=True
   """
   for k, v in kwargs.items():
-    str += f"--{k}={v}"
+    str += f" --{k}={v}"
   return str
 
 
@@ -107,44 +95,36 @@ def create_and_run_ray_program(
     folder : Optional[str] = None,
     wandb_init_kwargs: dict = None,
     default_env_kwargs: dict = None,
+    num_actors: int = 1,
+    run_distributed: bool = False,
+    report_file: Optional[str] = None,
     skip: bool = True,
     debug: bool = False):
   """Create and run launchpad program
   """
+  # own process group so whole program can be killed if trial is stopped early
+  os.setsid()
 
   agent = config.get('agent', None)
   assert agent
   cuda = config.pop('cuda', None)
+  wandb_init_kwargs = wandb_init_kwargs or {}
 
-  # -----------------------
-  # update env kwargs with config. HACK
-  # -----------------------
-  default_env_kwargs = default_env_kwargs or {}
-  env_kwargs = dict()
-  for key, value in default_env_kwargs.items():
-    env_kwargs[key] = config.pop(key, value)
+  group = config.pop('group', wandb_init_kwargs.get('group', None)) or 'ray'
 
   # -----------------------
-  # add env kwargs to path string. HACK
+  # split config into agent and env kwargs
   # -----------------------
-  # only use non-default arguments in path string
-  env_path=dict()
-  for k,v in env_kwargs.items():
-    if v != default_env_kwargs[k]:
-      env_path[k]=v
+  default_env_kwargs = default_env_kwargs or {}
+  agent_config, env_config = get_agent_env_configs(
+    config=config, default_env_kwargs=default_env_kwargs)
 
   # -----------------------
   # get log dir for experiment
   # -----------------------
-  setting=dict(
-    **env_path,
-    **config
-    )
-
-  wandb_group = None
-  if wandb_init_kwargs:
-    wandb_group = wandb_init_kwargs.get('group', None)
-  group = config.pop('group', wandb_group)
+  # only use non-default env arguments in path string
+  env_path = {k: v for k, v in env_config.items()
+              if default_env_kwargs.get(k, None) != v}
 
   # dir will be root_path/folder/group
   log_dir, exp_name = gen_log_dir(
@@ -153,7 +133,8 @@ def create_and_run_ray_program(
     return_kwpath=True,
     date=False,
     path_skip=['num_steps', 'num_learner_steps', 'group'],
-    **log_path_config
+    **agent_config,
+    **env_path,
     )
 
 
@@ -166,61 +147,123 @@ def create_and_run_ray_program(
     print(f"RUNNING\n{log_dir}")
     print("="*50)
 
-  # -----------------------
-  # wandb settings
-  # -----------------------
-  if wandb_init_kwargs:
-    wandb_init_kwargs['name']=exp_name # short display name for run
-    if group is not None:
-      wandb_init_kwargs['group']=group # short display name for run
-    wandb_init_kwargs['dir'] = folder
   # needed for various services (wandb, etc.)
   os.chdir(root_path)
 
   # -----------------------
   # launch experiment
   # -----------------------
-
   if debug:
-    config['num_steps'] = 50e3
-  agent_config_file = f'{log_dir}/agent_config_kw.pkl'
-  env_config_file = f'{log_dir}/env_config_kw.pkl'
-  paths.process_path(log_dir)
-  utils.save_config(agent_config_file, config)
-  utils.save_config(env_config_file, env_kwargs)
+    agent_config['num_steps'] = 50e3
 
-  command = make_program_command(
-    wandb_init_kwargs=wandb_init_kwargs,
+  # same format as entries of `run_sbatch`
+  paths.process_path(log_dir)
+  config_file = os.path.join(log_dir, 'config.jsonl')
+  utils.save_config_entries(config_file, [dict(
+    agent_config=agent_config,
+    env_config={**default_env_kwargs, **env_config},
+    use_wandb=bool(wandb_init_kwargs),
+    wandb_group=group,
+    wandb_name=exp_name,
+    wandb_project=wandb_init_kwargs.get('project'),
+    wandb_entity=wandb_init_kwargs.get('entity'),
     folder=log_dir,
-    agent_config=agent_config_file,
-    env_config=env_config_file,
-  )
+    num_actors=num_actors,
+    run_distributed=run_distributed,
+  )])
+
+  command = make_program_command(config_file=config_file)
   print(command)
   command = command.replace("\n", '')
   cuda_env = os.environ.copy()
   if cuda:
     cuda_env["CUDA_VISIBLE_DEVICES"] = str(cuda)
+  if report_file:
+    cuda_env[utils.REPORT_FILE_ENV] = report_file
   process = subprocess.Popen(command, env=cuda_env, shell=True)
   process.wait()
 
 
+def _grid_values(value) -> list:
+  """Values searched over for one key: a plain list or `tune.grid_search(list)`."""
+  if isinstance(value, dict) and 'grid_search' in value:
+    return value['grid_search']
+  return value
+
+def _to_tune(space: Union[Dict, List[Dict]]) -> List[Dict]:
+  """Wrap each key's values in `tune.grid_search` (only needed by the ray driver)."""
+  from ray import tune
+  if isinstance(space, dict):
+    space = [space]
+  return [{key: tune.grid_search(_grid_values(value)) for key, value in s.items()}
+          for s in space]
+
+def max_num_steps(space: Union[Dict, List[Dict]], default: int):
+  """Largest "num_steps" searched over in `space` (else `default`)."""
+  if isinstance(space, dict):
+    space = [space]
+  num_steps = [default]
+  for s in space:
+    if 'num_steps' in s:
+      num_steps.extend(_grid_values(s['num_steps']))
+  return int(max(num_steps))
+
+def make_scheduler(name: str, max_t: int):
+  """Early-stopping scheduler for ray tune. Trials are compared on the average return reported by the training loop's logger (see `experiment_logger.ReportFilter`), timed by training steps.
+  """
+  from ray import tune
+  if name == 'none':
+    return None
+  elif name == 'asha':
+    return tune.schedulers.AsyncHyperBandScheduler(
+      time_attr='env_steps',
+      metric='actor/episode_return',
+      mode='max',
+      max_t=max_t,
+      grace_period=max(1, max_t//10),
+      reduction_factor=3)
+  elif name == 'median':
+    return tune.schedulers.MedianStoppingRule(
+      time_attr='env_steps',
+      metric='actor/episode_return',
+      mode='max',
+      grace_period=max(1, max_t//10))
+  else:
+    raise NotImplementedError(name)
+
 def run_ray(
     wandb_init_kwargs: dict,
-    default_env_kwargs: dict,
     folder: str,
     space: Union[Dict, List[Dict]],
+    default_env_kwargs: dict = None,
     use_wandb: bool = False,
     debug: bool = False,
+    max_t: int = int(1e6),
     **kwargs):
+  """Run each configuration as a ray tune trial.
+
+  Each trial process appends its average return to a report file (see `utils.report_metrics`), which the trial forwards to ray tune. This lets `FLAGS.scheduler` stop poorly performing trials early. NOTE: early-stopping only applies here, not to `run_sbatch`.
+
+  Args:
+      max_t (int): maximum number of environment steps of a trial.
+  """
+
+  from ray import tune
+  # ray>=2.7 takes a metrics dict and `storage_path`, older versions kwargs and `local_dir`
+  new_tune_api = 'metrics' in inspect.signature(tune.report).parameters
+  report = tune.report if new_tune_api else lambda metrics: tune.report(**metrics)
+  storage = dict(storage_path='/tmp/ray') if new_tune_api else dict(local_dir='/tmp/ray')
 
   mp.set_start_method('spawn')
   root_path = str(Path().absolute())
   skip = FLAGS.skip
-
+  scheduler = make_scheduler(FLAGS.scheduler, max_t=max_t)
 
   def train_function(config):
     """Run inside threads and creates new process.
     """
+    report_fd, report_file = tempfile.mkstemp(suffix='.jsonl', dir='/tmp')
+    os.close(report_fd)
     p = mp.Process(
       target=create_and_run_ray_program, 
       args=(config,),
@@ -229,6 +272,7 @@ def run_ray(
         folder=folder,
         wandb_init_kwargs=wandb_init_kwargs if use_wandb else None,
         default_env_kwargs=default_env_kwargs,
+        report_file=report_file,
         debug=debug,
         skip=skip,
         **kwargs)
@@ -237,11 +281,29 @@ def run_ray(
     wait_time = 30.0 # avoid collisions
     if wait_time and not debug:
       time.sleep(wait_time)
-    p.join() # this blocks until the process terminates
-    # this will call right away and end.
 
-  if isinstance(space, dict):
-    space = [space]
+    # forward metrics to ray tune until the process terminates.
+    # if the scheduler stops this trial, tune.report will raise.
+    try:
+      with open(report_file, 'r') as fp:
+        partial = ''
+        while True:
+          alive = p.is_alive()
+          # last piece may be a partially written line
+          *lines, partial = (partial + fp.read()).split('\n')
+          for line in lines:
+            if line:
+              report(json.loads(line))
+          if not alive:
+            break
+          time.sleep(10.0)
+    finally:
+      if p.is_alive():
+        os.killpg(p.pid, signal.SIGTERM)
+      p.join()
+      os.remove(report_file)
+
+  space = _to_tune(space)
 
   from pprint import pprint
   pprint(space)
@@ -251,11 +313,11 @@ def run_ray(
       run=train_function,
       config=s,
       resources_per_trial={"cpu": FLAGS.num_cpus, "gpu": FLAGS.num_gpus}, 
-      local_dir='/tmp/ray',
+      **storage,
     ) 
     for s in space
   ]
-  tune.run_experiments(experiment_specs)
+  tune.run_experiments(experiment_specs, scheduler=scheduler)
 
   import shutil
   if use_wandb:
@@ -263,22 +325,24 @@ def run_ray(
     if os.path.exists(wandb_dir):
       shutil.rmtree(wandb_dir)
 
-def get_all_configurations(spaces: Union[Dict, List[Dict]]):
+def iter_configurations(spaces: Union[Dict, List[Dict]]):
+    """Lazily yield each configuration in the cartesian product of every space's values (plain lists or `tune.grid_search`).
+
+    Trainers keep their searches in a module-level `_SWEEPS` table (search name --> spaces) of plain lists, so that workers don't need ray. Only the ray driver wraps them, see `_to_tune`. `sweep()` returns a copy of its table's entry, so callers may edit it.
+    """
     import itertools
-    all_settings = []
     if isinstance(spaces, dict):
       spaces = [spaces]
     for space in spaces:
       # Extract keys and their corresponding lists from the space dictionary
-      keys, value_lists = zip(*[(key, space[key]['grid_search']) for key in space])
+      keys, value_lists = zip(*[(key, _grid_values(space[key])) for key in space])
 
       # Generate the Cartesian product of the value lists
-      cartesian_product = itertools.product(*value_lists)
-
-      # Create a list of dictionaries for each combination
-      all_settings += [dict(zip(keys, values)) for values in cartesian_product]
+      for values in itertools.product(*value_lists):
+        yield dict(zip(keys, values))
 
-    return all_settings
+def get_all_configurations(spaces: Union[Dict, List[Dict]]):
+    return list(iter_configurations(spaces=spaces))
 
 def get_agent_env_configs(
     config: dict,
@@ -313,23 +377,16 @@ def get_agent_env_configs(
   
   return agent_config, env_config
 
-def run_sbatch(
-    trainer_filename: str,
+def make_save_configs(
     wandb_init_kwargs: dict,
+    root_path: str,
     folder: str,
     search_name: str,
     spaces: Union[Dict, List[Dict]],
     use_wandb: bool = False,
     num_actors: int = 4,
-    debug: bool = False,
     run_distributed: bool = True):
-  """For each possible configuration of a run, create a config entry. save a list of all config entries. When SBATCH is called, it will use the ${SLURM_ARRAY_TASK_ID} to run a particular one.
-  """
-
-  #################################
-  # create configs for all runs
-  #################################
-  root_path = str(Path().absolute())
+  """Create a config entry (agent/env kwargs, log dir, wandb names) for each possible configuration of a run."""
   configurations = get_all_configurations(spaces=spaces)
   from pprint import pprint
   logging.info("searching:")
@@ -361,26 +418,54 @@ def run_sbatch(
       use_wandb=use_wandb,
       wandb_group=group,
       wandb_name=exp_name,
-      wandb_project=wandb_init_kwargs['project'],
-      wandb_entity=wandb_init_kwargs['entity'],
+      wandb_project=wandb_init_kwargs.get('project'),
+      wandb_entity=wandb_init_kwargs.get('entity'),
       folder=log_dir,
       num_actors=num_actors,
       run_distributed=run_distributed,
     )
     save_configs.append(save_config)
 
+  return save_configs
+
+def run_sbatch(
+    trainer_filename: str,
+    wandb_init_kwargs: dict,
+    folder: str,
+    search_name: str,
+    spaces: Union[Dict, List[Dict]],
+    use_wandb: bool = False,
+    num_actors: int = 4,
+    debug: bool = False,
+    run_distributed: bool = True):
+  """For each possible configuration of a run, create a config entry. save a list of all config entries. When SBATCH is called, it will use the ${SLURM_ARRAY_TASK_ID} to run a particular one.
+  """
+
+  #################################
+  # create configs for all runs
+  #################################
+  root_path = str(Path().absolute())
+  save_configs = make_save_configs(
+    wandb_init_kwargs=wandb_init_kwargs,
+    root_path=root_path,
+    folder=folder,
+    search_name=search_name,
+    spaces=spaces,
+    use_wandb=use_wandb,
+    num_actors=num_actors,
+    run_distributed=run_distributed)
+
   #################################
   # save configs for all runs
   #################################
-  # root_path/run_{search_name}-date-hour.pkl
+  # root_path/run_{search_name}-date-hour_config.jsonl (+ .idx)
+  # each task only reads its own entry, see `utils.load_config_entry`
   base_path = os.path.join(root_path, folder, 'runs', search_name)
   paths.process_path(base_path)
 
   base_filename = os.path.join(base_path, date_time(time=True))
-  configs_file = f"{base_filename}_config.pkl"
-  with open(configs_file, 'wb') as fp:
-      pickle.dump(save_configs, fp)
-      logging.info(f'Saved: {configs_file}')
+  configs_file = f"{base_filename}_config.jsonl"
+  utils.save_config_entries(configs_file, save_configs)
 
   #################################
   # create run.sh file to run with sbatch
@@ -396,6 +481,8 @@ def run_sbatch(
   python_file_contents += f" --run_distributed={run_distributed}"
   python_file_contents += f" --subprocess={True}"
   python_file_contents += f" --make_path={False}"
+  # shared across SLURM nodes
+  python_file_contents += f" --jax_cache_dir={os.path.join(root_path, folder, 'jax_cache')}"
 
   run_file = f"{base_filename}_run.sh"
 
@@ -441,3 +528,55 @@ def run_sbatch(
   process = subprocess.Popen(sbatch_command, shell=True)
   process.wait()
 
+
+
+def run_serial(
+    train_fn,
+    wandb_init_kwargs: dict,
+    folder: str,
+    search_name: str,
+    spaces: Union[Dict, List[Dict]],
+    use_wandb: bool = False,
+    num_actors: int = 1):
+  """Run all configurations of a search one after another inside this process.
+
+  Trials share one python startup and JAX's in-memory compilation cache instead of paying for them in a separate process per trial. Nothing is vmapped or pmapped across trials.
+
+  Args:
+      train_fn: e.g. `train_single` of a trainer file.
+  """
+  root_path = str(Path().absolute())
+  save_configs = make_save_configs(
+    wandb_init_kwargs=wandb_init_kwargs,
+    root_path=root_path,
+    folder=folder,
+    search_name=search_name,
+    spaces=spaces,
+    use_wandb=use_wandb,
+    num_actors=num_actors,
+    run_distributed=False)
+  logging.info(f'{len(save_configs)} trials')
+
+  for config in save_configs:
+    if FLAGS.skip and os.path.exists(config['folder']) and directory_not_empty(config['folder']):
+      logging.info(f"SKIPPING {config['folder']}")
+      continue
+
+    trial_wandb_init_kwargs = dict()
+    if use_wandb:
+      trial_wandb_init_kwargs = dict(
+        wandb_init_kwargs,
+        group=config['wandb_group'],
+        name=config['wandb_name'])
+
+    train_fn(
+      wandb_init_kwargs=trial_wandb_init_kwargs,
+      env_kwargs=dict(config['env_config']),
+      agent_config_kwargs=dict(config['agent_config']),
+      log_dir=config['folder'],
+      num_actors=config['num_actors'],
+      run_distributed=config['run_distributed'])
+
+    if use_wandb:
+      import wandb
+      wandb.finish()
@@ -16,24 +16,33 @@
 
 import sys
 import time
-from typing import Optional, Sequence, Tuple
+from typing import Callable, Optional, Sequence, Tuple
 
 import acme
 from acme import core
 from acme import specs
 from acme import types
+from acme.agents.jax import actor_core as actor_core_lib
 from acme.jax import utils
+from acme.jax import variable_utils
 from acme.jax.experiments import config
 from acme.tf import savers
 from acme.utils import counting
+from acme.utils import loggers
+from acme.utils import observers as observers_lib
 import dm_env
 import jax
+import numpy as np
 import reverb
+import tree
 
 
 def run_experiment(experiment: config.ExperimentConfig,
                    eval_every: int = 100,
-                   num_eval_episodes: int = 1):
+                   num_eval_episodes: int = 1,
+                   vectorized_eval: bool = False,
+                   batch_environment_factory: Optional[
+                       Callable[..., dm_env.Environment]] = None):
   """Runs a simple, single-threaded training loop using the default evaluators.
 
   It targets simplicity of the code and so only the basic features of the
@@ -44,6 +53,16 @@ def run_experiment(experiment: config.ExperimentConfig,
     eval_every: After how many actor steps to perform evaluation.
     num_eval_episodes: How many evaluation episodes to execute at each
       evaluation step.
+    vectorized_eval: If True, run the evaluation episodes in lock-step in
+      `num_eval_episodes` environments, selecting all of their actions with
+      one batched policy call (see `_VectorizedEvalLoop`). Otherwise, run them
+      one after another in the training environment.
+    batch_environment_factory: Optional, for `vectorized_eval`.
+      `batch_environment_factory(seed, num_lanes=num_eval_episodes)` returns
+      one environment whose specs and timesteps have a leading lane axis
+      (e.g. `minigrid_jax.BatchEnvWrapper`), so that all lanes are stepped
+      with one call. Otherwise, `num_eval_episodes` environments are made
+      with `experiment.environment_factory` and stepped one after another.
   """
 
   key = jax.random.PRNGKey(experiment.seed)
@@ -154,32 +173,187 @@ def run_experiment(experiment: config.ExperimentConfig,
   eval_logger = experiment.logger_factory('evaluator',
                                           eval_counter.get_steps_key(), 0)
 
-  eval_actor = experiment.builder.make_actor(
-      random_key=jax.random.PRNGKey(experiment.seed),
-      policy=config.make_policy(
-        experiment=experiment,
-        networks=networks,
-        environment_spec=environment_spec,
-        evaluation=True),
+  eval_policy = config.make_policy(
+      experiment=experiment,
+      networks=networks,
       environment_spec=environment_spec,
-      variable_source=learner)
-  eval_loop = acme.EnvironmentLoop(
-      environment,
-      eval_actor,
-      counter=eval_counter,
-      logger=eval_logger,
-      observers=experiment.observers)
+      evaluation=True)
+  if vectorized_eval:
+    if batch_environment_factory is not None:
+      eval_environment = batch_environment_factory(
+          experiment.seed + 1, num_lanes=num_eval_episodes)
+      # observers only read single-lane specs/tasks from these
+      lane_environments = [environment] * num_eval_episodes
+    else:
+      lane_environments = [
+          experiment.environment_factory(experiment.seed + 1 + i)
+          for i in range(num_eval_episodes)]
+      eval_environment = _StackedEnvironments(lane_environments)
+    eval_loop = _VectorizedEvalLoop(
+        environment=eval_environment,
+        num_lanes=num_eval_episodes,
+        policy=eval_policy,
+        variable_client=variable_utils.VariableClient(
+            learner, key='actor_variables'),
+        random_key=jax.random.PRNGKey(experiment.seed),
+        counter=eval_counter,
+        logger=eval_logger,
+        observers=experiment.observers,
+        lane_environments=lane_environments)
+    run_eval = eval_loop.run
+  else:
+    eval_actor = experiment.builder.make_actor(
+        random_key=jax.random.PRNGKey(experiment.seed),
+        policy=eval_policy,
+        environment_spec=environment_spec,
+        variable_source=learner)
+    eval_loop = acme.EnvironmentLoop(
+        environment,
+        eval_actor,
+        counter=eval_counter,
+        logger=eval_logger,
+        observers=experiment.observers)
+    run_eval = lambda: eval_loop.run(num_episodes=num_eval_episodes)
 
   steps = 0
   while steps < max_num_actor_steps:
-    eval_loop.run(num_episodes=num_eval_episodes)
+    run_eval()
     num_steps = min(eval_every, max_num_actor_steps - steps)
     steps += train_loop.run(num_steps=num_steps)
-  eval_loop.run(num_episodes=num_eval_episodes)
+  run_eval()
 
   environment.close()
 
 
+class _StackedEnvironments:
+  """Steps `environments` one after another, stacking their timesteps along a leading lane axis.
+
+  Environments whose episode has ended are not stepped again until `reset`.
+  """
+
+  def __init__(self, environments: Sequence[dm_env.Environment]):
+    assert len(set(map(id, environments))) == len(environments), (
+        '`environment_factory` must return a separate environment per seed')
+    self._environments = environments
+    self._timesteps = None
+
+  def reset(self) -> dm_env.TimeStep:
+    self._timesteps = [env.reset() for env in self._environments]
+    return self._stack()
+
+  def step(self, actions: types.NestedArray) -> dm_env.TimeStep:
+    for i, env in enumerate(self._environments):
+      if not self._timesteps[i].last():
+        self._timesteps[i] = env.step(actions[i])
+    return self._stack()
+
+  def _stack(self) -> dm_env.TimeStep:
+    return tree.map_structure(lambda *x: np.stack(x), *self._timesteps)
+
+
+class _VectorizedEvalLoop:
+  """Runs one evaluation episode in each of the `num_lanes` lanes of `environment`, in lock-step.
+
+  `environment`'s timesteps have a leading lane axis (see `run_experiment`).
+  The actions of all lanes are selected with a single vmapped and jitted call
+  of the policy instead of one policy call per environment step. Lanes whose
+  episode has ended wait for the others to finish.
+
+  Observers track one episode at a time, so each lane's episode is passed to
+  them after all lanes finish, together with that lane's entry of
+  `lane_environments`.
+  """
+
+  def __init__(self,
+               environment,
+               num_lanes: int,
+               policy: actor_core_lib.ActorCore,
+               variable_client: variable_utils.VariableClient,
+               random_key: jax.Array,
+               counter: counting.Counter,
+               logger: loggers.Logger,
+               observers: Sequence[observers_lib.EnvLoopObserver] = (),
+               lane_environments: Sequence[dm_env.Environment] = (),
+               backend: Optional[str] = 'cpu'):
+    assert not observers or len(lane_environments) == num_lanes
+    self._environment = environment
+    self._num_lanes = num_lanes
+    self._variable_client = variable_client
+    self._random_key = random_key
+    self._counter = counter
+    self._logger = logger
+    self._observers = observers
+    self._lane_environments = lane_environments
+    self._init = jax.jit(jax.vmap(policy.init), backend=backend)
+    self._policy = jax.jit(
+        jax.vmap(policy.select_action, in_axes=(None, 0, 0)), backend=backend)
+
+  def run(self) -> int:
+    """Runs one episode per lane and returns the total number of steps."""
+    num_lanes = self._num_lanes
+    self._random_key, key = jax.random.split(self._random_key)
+    state = self._init(jax.random.split(key, num_lanes))
+    self._variable_client.update_and_wait()
+    params = self._variable_client.params
+
+    start_time = time.time()
+    timestep = self._environment.reset()
+    timesteps, actions = [timestep], []
+    finished = np.zeros(num_lanes, dtype=bool)
+    lengths = np.zeros(num_lanes, dtype=np.int64)
+    returns = None
+
+    while not finished.all():
+      action, state = self._policy(params, timestep.observation, state)
+      action = utils.to_numpy(action)
+      timestep = self._environment.step(action)
+      if self._observers:
+        timesteps.append(timestep)
+        actions.append(action)
+      active = ~finished
+      if returns is None:
+        returns = tree.map_structure(np.zeros_like, timestep.reward)
+      returns = tree.map_structure(
+          lambda r, x: r + np.where(
+              active.reshape((-1,) + (1,) * (np.ndim(x) - 1)), x, 0),
+          returns, timestep.reward)
+      lengths += active
+      finished |= np.asarray(timestep.last())
+
+    duration = time.time() - start_time
+    num_steps = int(lengths.sum())
+    counts = self._counter.increment(episodes=num_lanes, steps=num_steps)
+    for i in range(num_lanes):
+      result = {
+          'episode_length': int(lengths[i]),
+          'episode_return': tree.map_structure(lambda r: r[i], returns),
+          'steps_per_second': num_steps / duration,
+          'episode_duration': duration,
+      }
+      result.update(counts)
+      if self._observers:
+        result.update(self._observe_lane(i, lengths[i], timesteps, actions))
+      self._logger.write(result)
+    return num_steps
+
+  def _observe_lane(self, lane, length, timesteps, actions):
+    """Passes the episode of `lane` to the observers and returns their metrics."""
+    environment = self._lane_environments[lane]
+    # first timesteps have no reward/discount
+    lane_of = lambda x: tree.map_structure(
+        lambda y: None if y is None else y[lane], x)
+    for observer in self._observers:
+      observer.observe_first(environment, lane_of(timesteps[0]))
+    for t in range(length):
+      for observer in self._observers:
+        observer.observe(
+            environment, lane_of(timesteps[t + 1]), actions[t][lane])
+    metrics = {}
+    for observer in self._observers:
+      metrics.update(observer.get_metrics())
+    return metrics
+
+
 class _LearningActor(core.Actor):
   """Actor which learns (updates its parameters) when `update` is called.
 
@@ -1,6 +1,10 @@
 from typing import Any, Dict, List, Optional, Sequence, Union
 
 import collections
+import hashlib
+import json
+import mmap
+import os
 import pickle 
 from absl import logging
 from pprint import pprint
@@ -20,6 +24,20 @@ from acme.utils.observers import EnvLoopObserver
 
 Number = Union[int, float, np.float32, jnp.float32]
 
+# set by `parallel.run_ray` so trial subprocesses can report progress
+REPORT_FILE_ENV = 'RL_REPORT_FILE'
+
+_COMPILATION_CACHE_DIR = None
+
+# agent config fields that change the shape of the jitted actor/learner graphs
+SHAPE_KEYS = (
+  'batch_size',
+  'trace_length',
+  'burn_in_length',
+  'state_dim',
+  'q_dim',
+)
+
 
 def flatten_dict(d, parent_key='', sep='_'):
   items = []
@@ -39,6 +57,35 @@ def load_config(filename):
     return config
 
 
+def save_config_entries(filename, configs: List[dict]):
+  """Save configs as newline-delimited json + a `{filename}.idx` file with the int64 byte offset of each line."""
+  offsets = np.zeros(len(configs), dtype=np.int64)
+  with open(filename, 'wb') as fp:
+    for idx, config in enumerate(configs):
+      offsets[idx] = fp.tell()
+      fp.write(json.dumps(config).encode() + b'\n')
+  offsets.tofile(f'{filename}.idx')
+  logging.info(f'Saved: {filename}')
+
+
+def load_config_entry(filename, idx: int):
+  """Load only the `idx`-th config of a file saved with `save_config_entries`.
+
+  Falls back to loading the full (pickled) list if there's no `.idx` file.
+  """
+  idx_file = f'{filename}.idx'
+  if not os.path.exists(idx_file):
+    return load_config(filename)[idx]
+
+  start = int(np.memmap(idx_file, dtype=np.int64, mode='r')[idx])
+  with open(filename, 'rb') as fp:
+    with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      end = mm.find(b'\n', start)
+      config = json.loads(mm[start:end])
+  logging.info(f'Loaded: {filename}[{idx}]')
+  return config
+
+
 def save_config(filename, config):
   with open(filename, 'wb') as fp:
       def fits(x):
@@ -63,6 +110,79 @@ def update_config(config, strict: bool = True, **kwargs):
     setattr(config, k, v)
 
 
+def report_metrics(metrics: Dict[str, Number]):
+  """Append metrics as a json line to `$RL_REPORT_FILE` if it's set.
+
+  Meant to be followed by a parent process, e.g. a ray tune trial (see `parallel.run_ray`)."""
+  report_file = os.environ.get(REPORT_FILE_ENV, None)
+  if not report_file:
+    return
+  with open(report_file, 'a') as fp:
+    fp.write(json.dumps(metrics) + '\n')
+
+
+def initialize_compilation_cache(
+    cache_dir: str,
+    min_compile_time_secs: float = 1.0,
+    **shape_kwargs):
+  """Use JAX's persistent compilation cache so that compiled programs are re-used across runs/processes.
+
+  Args:
+      cache_dir (str): base directory. should be shared across nodes (e.g. NFS) for SLURM.
+      min_compile_time_secs (float): only cache programs that took at least this long to compile.
+      shape_kwargs: hyperparameters that change program shapes (e.g. batch_size). programs are stored under cache_dir/<hash of shape_kwargs>.
+
+  Returns:
+      str: directory used for the cache.
+  """
+  global _COMPILATION_CACHE_DIR
+  if shape_kwargs:
+    key = ','.join(f'{k}={v}' for k, v in sorted(shape_kwargs.items()))
+    cache_dir = os.path.join(
+      cache_dir, hashlib.md5(key.encode()).hexdigest()[:12])
+
+  if _COMPILATION_CACHE_DIR is not None:
+    # can only be initialized once per process
+    if cache_dir != _COMPILATION_CACHE_DIR:
+      logging.warning(
+        f'compilation cache already at {_COMPILATION_CACHE_DIR}. ignoring {cache_dir}')
+    return _COMPILATION_CACHE_DIR
+
+  os.makedirs(cache_dir, exist_ok=True)
+  try:
+    jax.config.update('jax_compilation_cache_dir', cache_dir)
+  except AttributeError:
+    # older jax (e.g. 0.4.3)
+    from jax.experimental.compilation_cache import compilation_cache
+    compilation_cache.initialize_cache(cache_dir)
+  try:
+    jax.config.update(
+      'jax_persistent_cache_min_compile_time_secs', min_compile_time_secs)
+  except AttributeError:
+    logging.warning('jax version has no jax_persistent_cache_min_compile_time_secs')
+
+  logging.info(f'JAX compilation cache: {cache_dir}')
+  _COMPILATION_CACHE_DIR = cache_dir
+  return cache_dir
+
+
+def initialize_config_compilation_cache(config, cache_dir: str = ''):
+  """`initialize_compilation_cache` keyed by the `SHAPE_KEYS` fields of an agent config.
+
+  Args:
+      config: agent config.
+      cache_dir (str): base directory. defaults to ${RL_RESULTS_DIR}/jax_cache.
+
+  Returns:
+      str: directory used for the cache.
+  """
+  cache_dir = cache_dir or os.path.join(
+    os.environ.get('RL_RESULTS_DIR', '/tmp/rl_results'), 'jax_cache')
+  return initialize_compilation_cache(
+    cache_dir,
+    **{k: getattr(config, k) for k in SHAPE_KEYS if hasattr(config, k)})
+
+
 def _generate_zeros_from_spec(spec: specs.Array) -> np.ndarray:
   return np.zeros(spec.shape, spec.dtype)
 
@@ -111,7 +231,14 @@ class LevelAvgObserver(EnvLoopObserver):
     return self._get_task_name(env)
 
 class LevelAvgReturnObserver(LevelAvgObserver):
-  """Metric: Average return over many episodes"""
+  """Metric: Average return over many episodes.
+
+  Returns are accumulated as a running sum + count per task (instead of in `self.results`), so each episode is O(1)."""
+
+  def __init__(self, *args, **kwargs):
+    super(LevelAvgReturnObserver, self).__init__(*args, **kwargs)
+    self._return_sums = collections.defaultdict(float)
+    self._return_counts = collections.defaultdict(int)
 
   def observe_first(self, env: dm_env.Environment, timestep: dm_env.TimeStep
                     ) -> None:
@@ -131,19 +258,22 @@ class LevelAvgReturnObserver(LevelAvgObserver):
       timestep.reward)
 
     if timestep.last():
-      self.results[self.task_name].append(self._episode_return)
-      self.results['0.overall'].append(self._episode_return)
+      episode_return = float(np.mean(self._episode_return))
+      for key in (self.task_name, '0.overall'):
+        self._return_sums[key] += episode_return
+        self._return_counts[key] += 1
 
   def get_metrics(self) -> Dict[str, Number]:
     """Returns metrics collected for the current episode."""
     result = {}
 
     if self.idx % self.reset == 0:
-      for key, returns in self.results.items():
-        if not returns: continue
-        avg = np.array(returns).mean()
+      for key, count in self._return_counts.items():
+        if not count: continue
+        avg = self._return_sums[key]/count
         result[f'{self.prefix}/{key}/avg_return'] = float(avg)
-        self.results[key] = []
+        self._return_sums[key] = 0.0
+        self._return_counts[key] = 0
 
       result['log_data'] = True
 
@@ -22,9 +22,11 @@ from acme.jax import utils
 from acme.utils import async_utils
 from acme.utils import counting
 from acme.utils import loggers
+from acme.jax import variable_utils
 from acme.agents.jax import r2d2
 from acme.jax import utils
 from acme.agents.jax import actor_core as actor_core_lib
+from acme.agents.jax import actors
 from acme.agents.jax.r2d2 import actor as r2d2_actor
 from acme.agents.jax.r2d2 import actor as r2d2_actor
 from acme.agents.jax.r2d2 import config as r2d2_config
@@ -154,6 +156,9 @@ class Config(r2d2.R2D2Config):
   priority_exponent: float = 0.9
   max_priority_weight: float = 0.9
 
+  # Actor options
+  prejit: bool = False  # compile the training policy once when it's built
+
 @dataclasses.dataclass
 class NetworkFn:
   """Pure functions representing recurrent network components.
@@ -632,11 +637,62 @@ class Builder(r2d2.R2D2Builder):
                   networks: r2d2_networks.R2D2Networks,
                   environment_spec: specs.EnvironmentSpec,
                   evaluation: bool = False) -> r2d2_actor.R2D2Policy:
-    del environment_spec
-    return self._get_actor_core_fn(
+    actor_core = self._get_actor_core_fn(
       networks=networks,
       evaluation=evaluation,
       config=self._config)
+    # evaluation actors are vmapped (and re-jitted) by vectorized eval, so only
+    # the training policy is compiled up front.
+    if self._config.prejit and not evaluation:
+      actor_core = prejit_actor_core(
+        actor_core, networks, environment_spec)
+    return actor_core
+
+  def make_actor(
+      self,
+      random_key: networks_lib.PRNGKey,
+      policy: r2d2_actor.R2D2Policy,
+      environment_spec: specs.EnvironmentSpec,
+      variable_source: Optional[core.VariableSource] = None,
+      adder: Optional[adders.Adder] = None,
+  ) -> acme.Actor:
+    if not isinstance(policy, PrejittedActorCore):
+      return super().make_actor(
+        random_key, policy, environment_spec, variable_source, adder)
+
+    variable_client = variable_utils.VariableClient(
+        variable_source,
+        key='actor_variables',
+        update_period=self._config.variable_update_period)
+    # policy was already jitted in `make_policy`
+    return actors.GenericActor(
+        policy, random_key, variable_client, adder, jit=False)
+
+class PrejittedActorCore(actor_core_lib.ActorCore):
+  """ActorCore whose functions are already jitted, see `prejit_actor_core`."""
+
+def prejit_actor_core(
+    actor_core: actor_core_lib.ActorCore,
+    networks: r2d2_networks.R2D2Networks,
+    environment_spec: specs.EnvironmentSpec,
+    backend: Optional[str] = 'cpu',
+    ) -> actor_core_lib.ActorCore:
+  """Jit actor core.
+
+  `select_action` is called once on zero inputs so it is compiled before the first environment step instead of during it. Params are zeros of the right shape, so networks aren't initialized just for this.
+  """
+  init = jax.jit(actor_core.init, backend=backend)
+  select_action = jax.jit(actor_core.select_action, backend=backend)
+
+  key = jax.random.PRNGKey(0)
+  params = utils.zeros_like(jax.eval_shape(networks.init, key))
+  observation = utils.zeros_like(environment_spec.observations)
+  jax.block_until_ready(select_action(params, observation, init(key)))
+
+  return PrejittedActorCore(
+    init=init,
+    select_action=select_action,
+    get_extras=actor_core.get_extras)
 
 def get_actor_core(
     networks: r2d2_networks.R2D2Networks,
@@ -27,6 +27,7 @@ Array = acme_types.NestedArray
 @dataclasses.dataclass
 class Config(basics.Config):
   q_dim: int = 512
+  torso_dtype: str = 'float32'  # compute dtype of vision torso, e.g. bfloat16
 
 @dataclasses.dataclass
 class R2D2LossFn(basics.RecurrentLossFn):
@@ -125,20 +126,27 @@ class R2D2Arch(hk.RNNCore):
 def make_minigrid_networks(
         env_spec: specs.EnvironmentSpec,
         config: Config,
-        task_encoder: Callable[[Array], Array] = lambda obs: None
+        task_encoder: Callable[[Array], Array] = lambda obs: None,
+        symbolic: bool = False,
         ) -> r2d2.R2D2Networks:
-  """Builds default R2D2 networks for Atari games."""
+  """Builds default R2D2 networks for Atari games.
+
+  If `symbolic`, observation['image'] is minigrid's symbolic grid instead of pixels.
+  """
 
   num_actions = env_spec.actions.num_values
+  VisionTorso = networks.SymbolicVisionTorso if symbolic else networks.AtariVisionTorso
+  # images are stored as uint8 and only cast inside the network
+  networks.set_compute_dtype(VisionTorso, dtype=config.torso_dtype)
 
   def make_core_module() -> R2D2Arch:
-    vision_torso = networks.AtariVisionTorso(
-      out_dim=config.state_dim)
+    vision_torso = VisionTorso(out_dim=config.state_dim)
 
     observation_fn = networks.OarTorso(
       num_actions=num_actions,
       vision_torso=vision_torso,
       task_encoder=task_encoder,
+      image_scale=1.0 if symbolic else 255.0,
     )
 
     return R2D2Arch(